@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sync (threadpool) handlers against ASYNC_MODE at high concurrency
+Run: python bench_async_vs_sync.py [--concurrency 200] [--requests 4000]
+
+By default a throwaway SQLite database is seeded and served by uvicorn once
+per mode. Pass --database-url to run against an existing MySQL database.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server, summarize, timed_request
+
+ROUTES = ["/appointments/?limit=20", "/barbers/?limit=20", "/customers/?limit=20", "/appointments/by-barber/1"]
+
+
+async def hammer(port, concurrency, total):
+    latencies = []
+    outcomes = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        queue = iter(range(total))
+
+        async def worker():
+            for i in queue:
+                outcome, seconds, _ = await timed_request(client, "GET", ROUTES[i % len(ROUTES)])
+                outcomes[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(seconds)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return dict(summarize(latencies, elapsed), **outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of an existing, populated database")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or seed_sqlite(os.path.join(tmp, "bench.db"))
+        print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'503':>6}{'dropped':>9}")
+        for async_mode in (False, True):
+            server = start_server(database_url, args.port, ASYNC_MODE="1" if async_mode else "0")
+            try:
+                asyncio.run(hammer(args.port, args.concurrency, args.concurrency))  # warm-up
+                result = asyncio.run(hammer(args.port, args.concurrency, args.requests))
+            finally:
+                stop_server(server)
+            mode = "async" if async_mode else "sync"
+            print(f"{mode:<8}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p99']:>10.1f}"
+                  f"{result.get('error', 0):>8}{result.get('shed', 0):>6}{result.get('dropped', 0):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Booking contention benchmark: many customers booking the same barber at once
+Run: python bench_booking_contention.py [--customers 300] [--slots 16]
+
+Every client tries to book one of --slots half-hour slots of barber 1 on the
+same day. Exactly one booking per slot may succeed; everything else must be
+rejected with 409. The script reports throughput, latency and the outcome
+counts, then checks the stored appointments for overlaps.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server, summarize, timed_request
+
+BOOKING_DATE = "2030-01-07"
+
+
+def slot_times(index):
+    start = datetime(2030, 1, 7, 9) + timedelta(minutes=30 * index)
+    return start.time().isoformat(), (start + timedelta(minutes=30)).time().isoformat()
+
+
+async def book_all(port, customers, slots, customer_pool):
+    outcomes = Counter()
+    latencies = []
+    limits = httpx.Limits(max_connections=customers, max_keepalive_connections=customers)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+
+        async def book(i):
+            start_time, end_time = slot_times(random.randrange(slots))
+            payload = {"id_customer": i % customer_pool + 1, "id_barber": 1, "appointment_date": BOOKING_DATE,
+                       "start_time": start_time, "end_time": end_time}
+            outcome, seconds, response = await timed_request(client, "POST", "/appointments/", json=payload)
+            if response is None:
+                outcomes[outcome] += 1
+                return
+            latencies.append(seconds)
+            outcomes[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(book(i) for i in range(customers)))
+        elapsed = time.perf_counter() - started
+
+        booked = (await client.get("/appointments/by-barber/1")).json()
+    day = sorted((a["start_time"], a["end_time"]) for a in booked
+                 if a["appointment_date"] == BOOKING_DATE and a["status"] != "cancelled")
+    overlaps = sum(1 for prev, cur in zip(day, day[1:]) if cur[0] < prev[1])
+    return summarize(latencies, elapsed), outcomes, len(day), overlaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of an existing, populated database")
+    parser.add_argument("--customers", type=int, default=300)
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or seed_sqlite(os.path.join(tmp, "bench.db"))
+        server = start_server(database_url, args.port)
+        try:
+            result, outcomes, booked, overlaps = asyncio.run(book_all(args.port, args.customers, args.slots, 200))
+        finally:
+            stop_server(server)
+
+    print(f"requests: {args.customers}  slots: {args.slots}")
+    print(f"req/s: {result['rps']:.1f}  p50: {result['p50']:.1f} ms  p95: {result['p95']:.1f} ms  p99: {result['p99']:.1f} ms")
+    print("responses: " + ", ".join(f"{code}={count}" for code, count in sorted(outcomes.items())))
+    print(f"booked on {BOOKING_DATE}: {booked}  overlapping pairs: {overlaps}")
+    if overlaps:
+        raise SystemExit("double booking detected")
+
+
+if __name__ == "__main__":
+    main()
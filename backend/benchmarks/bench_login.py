@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Login throughput: concurrent POST /auth/login against the password pool
+Run: python bench_login.py [--logins 400] [--concurrency 32] [--password-workers 1,2,4]
+
+The script signs up --users accounts with one POST /users/bulk, then for
+each PASSWORD_WORKERS value starts a server and sends --logins logins
+from --concurrency clients at once. While they run, a single client keeps
+reading GET /users/1, to show that cheap requests are still served while
+every login costs a full password hash. Reports logins per second, login
+latency, the reads' latency under the login load and without it, and the
+non-200 responses (503 when the hashing queue is full).
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server, summarize
+
+
+async def probe(client, stop):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        (await client.get("/users/1")).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def run_logins(port, users, logins, concurrency):
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=300) as client:
+        # Read latency without login load
+        quiet = []
+        for _ in range(50):
+            started = time.perf_counter()
+            (await client.get("/users/1")).raise_for_status()
+            quiet.append(time.perf_counter() - started)
+
+        outcomes = Counter()
+        latencies = []
+        queue = asyncio.Queue()
+        for i in range(logins):
+            queue.put_nowait(i % users)
+
+        async def worker():
+            while not queue.empty():
+                user = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/auth/login", json={"email": f"login{user}@barberian.co", "password": f"pw-{user}"})
+                latencies.append(time.perf_counter() - started)
+                outcomes[response.status_code] += 1
+
+        stop = asyncio.Event()
+        reads = asyncio.create_task(probe(client, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        loaded = await reads
+        stats = (await client.get("/admin/passwords")).json()
+    return summarize(latencies, elapsed), summarize(quiet, 1), summarize(loaded, elapsed), outcomes, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--password-workers", default="1,2,4", help="comma-separated PASSWORD_WORKERS values")
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    accounts = [{"full_name": f"Login {i}", "email": f"login{i}@barberian.co", "password": f"pw-{i}", "id_role": 1}
+                for i in range(args.users)]
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = seed_sqlite(os.path.join(tmp, "bench.db"))
+        for run, workers in enumerate(int(value) for value in args.password_workers.split(",")):
+            # Enough queue for every concurrent login, so the run measures throughput, not shedding
+            server = start_server(database_url, args.port, PASSWORD_WORKERS=str(workers),
+                                  PASSWORD_QUEUE=str(args.concurrency))
+            try:
+                if not run:
+                    httpx.post(f"http://127.0.0.1:{args.port}/users/bulk", json=accounts, timeout=300).raise_for_status()
+                result, quiet, loaded, outcomes, stats = asyncio.run(
+                    run_logins(args.port, args.users, args.logins, args.concurrency))
+            finally:
+                stop_server(server)
+            print(f"PASSWORD_WORKERS={workers} ({stats['scheme']} cost {stats['cost']}, {os.cpu_count()} CPUs)")
+            print(f"  logins/s: {result['rps']:.1f}  p50: {result['p50']:.0f} ms  p95: {result['p95']:.0f} ms  "
+                  f"p99: {result['p99']:.0f} ms")
+            print(f"  GET /users/1 p50/p95: {quiet['p50']:.1f}/{quiet['p95']:.1f} ms idle, "
+                  f"{loaded['p50']:.1f}/{loaded['p95']:.1f} ms during logins")
+            print("  responses: " + ", ".join(f"{code}={count}" for code, count in sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    main()
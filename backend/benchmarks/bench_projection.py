@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Throughput of the response_model path against ?fields= / ?include= projections
+Run: python bench_projection.py [--concurrency 20] [--requests 1000]
+
+Each variant is requested back to back against one uvicorn server. The full
+variant renders nested ORM objects through Pydantic; the projected variants
+run a Core SELECT and render plain dicts with orjson.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server, summarize, timed_request
+
+VARIANTS = [
+    ("/appointments/ full", "/appointments/?limit=100"),
+    ("/appointments/ include", "/appointments/?limit=100&include=customer.user,barber.user"),
+    ("/appointments/ fields", "/appointments/?limit=100&fields=id_appointment,appointment_date,start_time,status,barber.user.full_name"),
+    ("/barbers/ full", "/barbers/?limit=100"),
+    ("/barbers/ include", "/barbers/?limit=100&include=user,specialty,city"),
+    ("/barbers/ fields", "/barbers/?limit=100&fields=id_barber,user.full_name,specialty.name"),
+]
+
+
+async def hammer(port, url, concurrency, total):
+    latencies = []
+    outcomes = Counter()
+    sizes = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        queue = iter(range(total))
+
+        async def worker():
+            for _ in queue:
+                outcome, seconds, response = await timed_request(client, "GET", url)
+                outcomes[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(seconds)
+                    sizes.append(len(response.content))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return dict(summarize(latencies, elapsed), **outcomes, size=sum(sizes) // max(len(sizes), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of an existing, populated database")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or seed_sqlite(os.path.join(tmp, "bench.db"), barbers=200)
+        server = start_server(database_url, args.port)
+        try:
+            print(f"{'variant':<26}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'bytes':>10}{'errors':>8}{'503':>6}{'dropped':>9}")
+            for name, url in VARIANTS:
+                asyncio.run(hammer(args.port, url, args.concurrency, args.concurrency))  # warm-up
+                result = asyncio.run(hammer(args.port, url, args.concurrency, args.requests))
+                print(f"{name:<26}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p99']:>10.1f}"
+                      f"{result['size']:>10}{result.get('error', 0):>8}{result.get('shed', 0):>6}{result.get('dropped', 0):>9}")
+        finally:
+            stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
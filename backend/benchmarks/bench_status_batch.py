@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Status transitions: one PATCH per appointment against one batch PATCH
+Run: python bench_status_batch.py [--appointments 200] [--rounds 3]
+
+Each round confirms --appointments pending appointments one request at a
+time (PATCH /appointments/{id}/status), then marks the same appointments done
+with a single PATCH /appointments/status. Reports the wall time of both
+paths and the appointments per second each reaches.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server
+
+
+def run_round(client, ids):
+    started = time.perf_counter()
+    for appointment_id in ids:
+        client.patch(f"/appointments/{appointment_id}/status", params={"status": "confirmed"}).raise_for_status()
+    per_row = time.perf_counter() - started
+
+    started = time.perf_counter()
+    response = client.patch("/appointments/status", json={"status": "done", "ids": ids})
+    response.raise_for_status()
+    batch = time.perf_counter() - started
+    if response.json()["updated"] != len(ids):
+        raise SystemExit(f"batch updated {response.json()['updated']} of {len(ids)} appointments")
+    return per_row, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appointments", type=int, default=200, help="appointments moved per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        total = args.appointments * args.rounds
+        database_url = seed_sqlite(os.path.join(tmp, "bench.db"), appointments=max(total, 2000))
+        # The seeded 2024 appointments are long past: keep the sweeper from cancelling them
+        server = start_server(database_url, args.port, SWEEPER="0")
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as client:
+                for round_number in range(args.rounds):
+                    first = round_number * args.appointments + 1
+                    ids = list(range(first, first + args.appointments))
+                    per_row, batch = run_round(client, ids)
+                    print(f"round {round_number + 1}: per-row {per_row * 1000:.0f} ms ({len(ids) / per_row:.0f}/s)  "
+                          f"batch {batch * 1000:.0f} ms ({len(ids) / batch:.0f}/s)  speedup x{per_row / batch:.1f}")
+        finally:
+            stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark throughput against the number of worker processes (serve.py)
+Run: python bench_workers.py [--workers 1,2,4,8] [--concurrency 64] [--duration 15]
+
+Each worker count gets a fresh server on the same database, a warm-up round,
+then a closed-loop run of read requests for --duration seconds. Reports
+req/s, p50/p99 and the speedup over the first worker count. The read routes
+are CPU-bound in Python (validation and serialization), so one process tops
+out at one core; expect near-linear scaling up to the core count (printed
+below) as long as the database keeps up. By default a throwaway SQLite
+database is seeded; pass --database-url to use MySQL (set DB_MAX_CONNECTIONS
+to keep the largest run within max_connections).
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server, summarize, timed_request
+
+ROUTES = ["/appointments/?limit=20", "/barbers/?limit=20", "/customers/?limit=20", "/barbers/1", "/appointments/1"]
+
+
+async def hammer(port, concurrency, duration):
+    latencies = []
+    outcomes = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def worker(offset):
+            i = offset
+            while time.perf_counter() < stop_at:
+                outcome, seconds, _ = await timed_request(client, "GET", ROUTES[i % len(ROUTES)])
+                outcomes[outcome] += 1
+                if outcome == "ok":
+                    latencies.append(seconds)
+                i += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return dict(summarize(latencies, elapsed), **outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of an existing, populated database")
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of traffic before measuring")
+    parser.add_argument("--port", type=int, default=8770)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or seed_sqlite(os.path.join(tmp, "bench.db"))
+        print(f"{os.cpu_count()} CPU core(s)")
+        print(f"{'workers':<9}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'503':>6}{'dropped':>9}{'speedup':>9}")
+        baseline = None
+        for workers in (int(count) for count in args.workers.split(",")):
+            server = start_server(database_url, args.port, workers=workers)
+            try:
+                asyncio.run(hammer(args.port, args.concurrency, args.warmup))
+                result = asyncio.run(hammer(args.port, args.concurrency, args.duration))
+            finally:
+                stop_server(server)
+            baseline = baseline or result["rps"]
+            print(f"{workers:<9}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p99']:>10.1f}"
+                  f"{result.get('error', 0):>8}{result.get('shed', 0):>6}{result.get('dropped', 0):>9}"
+                  f"{result['rps'] / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Shared helpers for the benchmark scripts: a seeded SQLite database, a server
+subprocess serving the app (serve.py), request outcomes and latency
+summaries.
+"""
+
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+import httpx
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+
+# The benchmarks measure a code path, not load shedding. Admission control
+# stays on, since it also sizes the threadpool to the connection pool (with
+# ADMISSION=0 sync handlers starve each other of threads under load), but its
+# queues are large enough and patient enough that no request is shed. The
+# environment or the caller can override these; start_server(shed_load=True)
+# keeps the production queues.
+SERVER_DEFAULTS = {
+    "ADMISSION_BOOKING_QUEUE": "100000",
+    "ADMISSION_BROWSE_QUEUE": "100000",
+    "ADMISSION_QUEUE_TIMEOUT": "3600",
+}
+
+
+def seed_sqlite(path, barbers=20, customers=200, appointments=2000):
+    """Create the schema in a SQLite file and fill it with a small dataset"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, SERVER_DIR)
+    import main
+
+    main.configure_database(main.Settings.from_env())
+    main.Base.metadata.create_all(main.engine)
+    db = main.SessionLocal()
+    db.add_all([main.Role(name="customer"), main.Genre(name="Male"), main.Department(name="Antioquia"),
+                main.Specialty(name="Classic cut", years_experience=3),
+                main.BarberSchedule(day_of_week=main.DayOfWeekEnum.monday, start_time=dtime(9), end_time=dtime(18))])
+    db.flush()
+    db.add(main.City(name="Medellin", id_department=1))
+    db.flush()
+    for i in range(barbers + customers):
+        db.add(main.User(full_name=f"User {i}", email=f"user{i}@example.com", id_role=1))
+    db.flush()
+    for i in range(barbers):
+        db.add(main.Barber(id_user=i + 1, id_genre=1, id_department=1, id_city=1, id_specialty=1, id_barber_schedule=1))
+    for i in range(customers):
+        db.add(main.Customer(id_user=barbers + i + 1, id_genre=1, id_department=1, id_city=1))
+    db.flush()
+    for i in range(appointments):
+        start = 9 + i % 8
+        db.add(main.Appointment(id_customer=i % customers + 1, id_barber=i % barbers + 1,
+                                appointment_date=date(2024, 1, 1) + timedelta(days=i // 40),
+                                start_time=dtime(start), end_time=dtime(start + 1)))
+    db.commit()
+    db.close()
+    main.engine.dispose()
+    return os.environ["DATABASE_URL"]
+
+
+def start_server(database_url, port, workers=1, shed_load=False, **env):
+    """Serve the app with serve.py in a subprocess and wait until its warmup is done"""
+    env = {**({} if shed_load else SERVER_DEFAULTS), **os.environ, "DATABASE_URL": database_url, **env}
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+         "--log-level", "critical"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    for _ in range(600):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(process):
+    process.terminate()
+    process.wait()
+
+
+async def timed_request(client, method, url, **kwargs):
+    """(outcome, seconds, response) of one request. outcome is "ok", "shed" (503
+    from admission control), "error" (any other 4xx/5xx) or "dropped" (the
+    connection failed; response is None)"""
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.TransportError:
+        return "dropped", time.perf_counter() - started, None
+    elapsed = time.perf_counter() - started
+    if response.status_code == 503:
+        return "shed", elapsed, response
+    return ("error" if response.status_code >= 400 else "ok"), elapsed, response
+
+
+def summarize(latencies, elapsed):
+    """req/s plus p50/p95/p99 in milliseconds"""
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"rps": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+    def percentile(p):
+        # Nearest-rank percentile
+        return latencies[max(math.ceil(len(latencies) * p) - 1, 0)] * 1000
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+HTTP load test replaying a realistic mix of API calls, with per-route latency
+Run: python load_test.py --database-url sqlite:///bench.db [--duration 30] [--concurrency 50]
+
+Closed-loop clients pick routes by weight (see build_mix) with ids drawn from the
+same Zipf popularity seed_data.py generates, so popular barbers and customers
+dominate just as in production. Reports requests, errors, 503s from
+admission control, req/s and p50/p95/p99 per route. A started server gets
+the production admission queues, so overload shows up as 503s. Save a run with --json and pass it to a later run
+with --baseline to print the p95 change next to every route.
+
+Point --base-url at a running server, or pass --database-url to start one.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+from common import start_server, stop_server, summarize, timed_request
+
+SKEW = 1.1
+
+
+class Sampler:
+    """Zipf-distributed ids 1..count (id 1 is the most popular)"""
+
+    def __init__(self, rng, count, skew=SKEW):
+        self.rng = rng
+        self.ids = range(1, max(count, 1) + 1)
+        self.cum_weights = list(itertools.accumulate(1 / rank ** skew for rank in self.ids))
+
+    def __call__(self):
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights)[0]
+
+
+def build_mix(rng, stats, write_weight):
+    """(route name, weight, request factory) triples; factories return (method, url, json body)"""
+    barber = Sampler(rng, stats["barbers"])
+    customer = Sampler(rng, stats["customers"])
+    city = Sampler(rng, stats["cities"])
+    appointment_count = max(stats["appointments"], 1)
+    today = date.today()
+
+    def nearby_day():
+        return (today + timedelta(days=rng.randint(-7, 21))).isoformat()
+
+    def booking():
+        slot = rng.randint(0, 17)
+        start, end = f"{9 + slot // 2:02d}:{30 * (slot % 2):02d}", f"{9 + (slot + 1) // 2:02d}:{30 * ((slot + 1) % 2):02d}"
+        return "POST", "/appointments/", {"id_customer": customer(), "id_barber": barber(),
+                                          "appointment_date": (today + timedelta(days=rng.randint(1, 30))).isoformat(),
+                                          "start_time": start, "end_time": end}
+
+    mix = [
+        ("GET /availability/", 12, lambda: ("GET", f"/availability/?appointment_date={nearby_day()}&barber_id={barber()}", None)),
+        ("GET /appointments/", 8, lambda: ("GET", "/appointments/?limit=50", None)),
+        ("GET /appointments/{id}", 8, lambda: ("GET", f"/appointments/{rng.randint(1, appointment_count)}", None)),
+        ("GET /appointments/by-customer/{id}", 6, lambda: ("GET", f"/appointments/by-customer/{customer()}", None)),
+        ("GET /appointments/by-barber/{id}", 3, lambda: ("GET", f"/appointments/by-barber/{barber()}", None)),
+        ("GET /barbers/", 6, lambda: ("GET", "/barbers/?limit=20", None)),
+        ("GET /barbers/{id}", 6, lambda: ("GET", f"/barbers/{barber()}", None)),
+        ("GET /barbers/by-city/{id}", 4, lambda: ("GET", f"/barbers/by-city/{city()}", None)),
+        ("GET /customers/{id}", 6, lambda: ("GET", f"/customers/{customer()}", None)),
+        ("GET /cities/", 4, lambda: ("GET", "/cities/", None)),
+        ("GET /roles/", 2, lambda: ("GET", "/roles/", None)),
+        ("GET /specialties/", 2, lambda: ("GET", "/specialties/", None)),
+        ("GET /stats", 2, lambda: ("GET", "/stats", None)),
+    ]
+    if write_weight:
+        mix.append(("POST /appointments/", write_weight, booking))
+    return mix
+
+
+async def run(base_url, mix, rng, concurrency, duration, warmup):
+    names, weights, factories = zip(*mix)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    shed = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def worker():
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    return
+                index = rng.choices(range(len(names)), weights)[0]
+                method, url, body = factories[index]()
+                sent = time.perf_counter()
+                outcome, seconds, response = await timed_request(client, method, url, json=body)
+                # A booking that loses its slot to another client is expected
+                failed = outcome in ("error", "dropped") and not (method == "POST" and response is not None
+                                                                  and response.status_code == 409)
+                if sent >= measure_from:
+                    latencies[names[index]].append(seconds)
+                    errors[names[index]] += failed
+                    shed[names[index]] += outcome == "shed"
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        name: dict(summarize(latencies[name], duration), requests=len(latencies[name]), errors=errors[name], shed=shed[name])
+        for name in names if latencies[name]
+    }
+
+
+def report(results, duration, baseline=None):
+    header = f"{'route':<38}{'requests':>9}{'errors':>8}{'503':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header + ("  p95 vs baseline" if baseline else ""))
+    for name, result in sorted(results.items(), key=lambda item: -item[1]["requests"]):
+        line = (f"{name:<38}{result['requests']:>9}{result['errors']:>8}{result.get('shed', 0):>6}{result['rps']:>9.1f}"
+                f"{result['p50']:>9.1f}{result['p95']:>9.1f}{result['p99']:>9.1f}")
+        if baseline and name in baseline:
+            before = baseline[name]["p95"]
+            line += f"  {before:>8.1f} -> {result['p95']:.1f} ({(result['p95'] - before) / before * 100:+.0f}%)"
+        print(line)
+    total = sum(result["requests"] for result in results.values())
+    failed = sum(result["errors"] for result in results.values())
+    shed = sum(result.get("shed", 0) for result in results.values())
+    print(f"{'total':<38}{total:>9}{failed:>8}{shed:>6}{total / duration:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url", help="URL of a running server")
+    target.add_argument("--database-url", help="start a server on this database (e.g. one filled by seed_data.py)")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of traffic before measuring")
+    parser.add_argument("--write-weight", type=int, default=1, help="weight of POST /appointments/ in the mix (0 = read only)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the per-route results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare p95 against")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the started server, e.g. ASYNC_MODE=1 (repeatable)")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if args.database_url:
+        server = start_server(args.database_url, args.port, shed_load=True,
+                              **dict(item.split("=", 1) for item in args.env))
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        rng = random.Random(args.seed)
+        stats = httpx.get(f"{base_url}/stats", timeout=600).json()
+        mix = build_mix(rng, stats, args.write_weight)
+        results = asyncio.run(run(base_url, mix, rng, args.concurrency, args.duration, args.warmup))
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)["routes"]
+    report(results, args.duration, baseline)
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration, "routes": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
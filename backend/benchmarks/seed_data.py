@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Synthetic, skewed dataset generator for the models in main.py
+Run: python seed_data.py --database-url sqlite:///bench.db [--scale medium] [--skew 1.1]
+
+Fills an empty database (SQLite or MySQL) with departments, cities,
+barbershops, barbers, customers and years of appointments. Popularity follows
+a Zipf law: barber 1 gets the most bookings, then barber 2, and so on (the
+same holds for customers and cities), so a few barbers own most of the
+history and hit their daily capacity. Appointments are 30-minute slots
+between 09:00 and 18:00 and never overlap per barber. Primary keys are
+assigned here, so the output is the same for the same --seed and --today.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+from sqlalchemy import bindparam, func, select
+
+from common import SERVER_DIR
+
+SCALES = {
+    "small": dict(departments=5, cities=30, barbershops=20, barbers=100, customers=5000, years=1, per_day=300),
+    "medium": dict(departments=15, cities=120, barbershops=80, barbers=400, customers=50000, years=3, per_day=1200),
+    "large": dict(departments=32, cities=400, barbershops=300, barbers=1500, customers=250000, years=5, per_day=4000),
+}
+
+FIRST_NAMES = ["Ana", "Carlos", "Diana", "Esteban", "Felipe", "Gloria", "Hector", "Isabel", "Juan", "Laura",
+               "Mateo", "Natalia", "Oscar", "Paula", "Ricardo", "Sofia", "Tomas", "Valentina", "William", "Ximena"]
+LAST_NAMES = ["Arango", "Botero", "Castro", "Duque", "Echeverri", "Franco", "Gomez", "Herrera", "Jaramillo",
+              "Lopez", "Mejia", "Naranjo", "Ospina", "Perez", "Quintero", "Restrepo", "Salazar", "Toro", "Uribe"]
+SPECIALTIES = ["Classic cut", "Fade", "Beard trim", "Shave", "Coloring", "Kids cut", "Braids", "Styling"]
+WORKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday"]
+SLOTS_PER_DAY = 18  # 30-minute slots from 09:00 to 18:00
+BATCH = 5000
+
+
+def zipf_weights(count, skew):
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def person(rng, index):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}"
+
+
+def phone(rng):
+    return f"3{rng.randint(0, 99):02d}{rng.randint(0, 9999999):07d}"
+
+
+def slot_time(slot):
+    return dtime(9 + slot // 2, 30 * (slot % 2))
+
+
+def appointment_status(rng, day, today):
+    roll = rng.random()
+    if day < today:
+        return "done" if roll < 0.85 else "cancelled"
+    return "pending" if roll < 0.6 else "confirmed" if roll < 0.95 else "cancelled"
+
+
+def write(connection, table, rows):
+    """Insert an iterable of row dicts in batches; returns the row count"""
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, BATCH))
+        if not batch:
+            return total
+        connection.execute(table.insert(), batch)
+        total += len(batch)
+
+
+def generate(main, connection, rng, args, today):
+    t = {model.__tablename__: model.__table__ for model in main.Base.__subclasses__()}
+    counts = {}
+
+    counts["roles"] = write(connection, t["roles"], [
+        {"id_role": i + 1, "name": name} for i, name in enumerate(["admin", "customer", "barber"])])
+    counts["genres"] = write(connection, t["genres"], [
+        {"id_genre": i + 1, "name": name} for i, name in enumerate(["Male", "Female", "Other"])])
+    counts["specialties"] = write(connection, t["specialties"], [
+        {"id_specialty": i + 1, "name": name, "years_experience": rng.randint(1, 15)} for i, name in enumerate(SPECIALTIES)])
+    counts["barber_schedule"] = write(connection, t["barber_schedule"], [
+        {"id_schedule": i + 1, "day_of_week": day, "start_time": dtime(9), "end_time": dtime(18)} for i, day in enumerate(WORKDAYS)])
+    counts["departments"] = write(connection, t["departments"], [
+        {"id_department": i + 1, "name": f"Department {i + 1}"} for i in range(args.departments)])
+
+    # Big departments get more cities; big cities get more barbers and customers
+    department_weights = zipf_weights(args.departments, args.skew)
+    city_department = [1 + i % args.departments if i < args.departments else
+                       rng.choices(range(1, args.departments + 1), department_weights)[0] for i in range(args.cities)]
+    counts["citys"] = write(connection, t["citys"], [
+        {"id_city": i + 1, "name": f"City {i + 1}", "id_department": department} for i, department in enumerate(city_department)])
+    city_weights = zipf_weights(args.cities, args.skew)
+
+    def home():
+        city = rng.choices(range(1, args.cities + 1), city_weights)[0]
+        return city, city_department[city - 1]
+
+    users = args.barbers + args.customers
+    counts["users"] = write(connection, t["users"], (
+        {"id_user": i + 1, "full_name": person(rng, i + 1), "email": f"user{i + 1}@example.com",
+         "password_hash": "seeded", "id_role": 3 if i < args.barbers else 2} for i in range(users)))
+
+    barber_homes = [home() for _ in range(args.barbers)]
+    counts["barbers"] = write(connection, t["barbers"], (
+        {"id_barber": i + 1, "id_user": i + 1, "id_genre": rng.randint(1, 3), "id_barbershop": None,
+         "id_specialty": rng.randint(1, len(SPECIALTIES)), "id_department": department, "id_city": city,
+         "id_barber_schedule": rng.randint(1, len(WORKDAYS)), "phone": phone(rng), "direction": f"Street {i + 1}",
+         "points": rng.randint(0, 500)} for i, (city, department) in enumerate(barber_homes)))
+
+    # Barbershops reference a staff row, staff references a barber, and the
+    # barber points back at the shop: owners first, then link the barbers
+    shops = min(args.barbershops, args.barbers)
+    counts["staff"] = write(connection, t["staff"], [{"id_staff": i + 1, "id_barber": i + 1} for i in range(shops)])
+    counts["barbershops"] = write(connection, t["barbershops"], [
+        {"id_barbershop": i + 1, "id_staff": i + 1, "phone": phone(rng)} for i in range(shops)])
+    counts["locations"] = write(connection, t["locations"], [
+        {"id_location": i + 1, "id_barbershop": i + 1, "id_department": barber_homes[i][1], "id_city": barber_homes[i][0],
+         "address": f"Avenue {i + 1} # {rng.randint(1, 99)}-{rng.randint(1, 99)}",
+         "opening_hour": dtime(9), "closing_hour": dtime(18)} for i in range(shops)])
+    if shops:
+        barbers = t["barbers"]
+        connection.execute(
+            barbers.update().where(barbers.c.id_barber == bindparam("b_id")).values(id_barbershop=bindparam("b_shop")),
+            [{"b_id": i + 1, "b_shop": i % shops + 1} for i in range(args.barbers)],
+        )
+
+    def customers():
+        for i in range(args.customers):
+            city, department = home()
+            yield {"id_customer": i + 1, "id_user": args.barbers + i + 1, "id_genre": rng.randint(1, 3), "phone": phone(rng),
+                   "direction": f"Carrera {i + 1}", "id_department": department, "id_city": city}
+
+    counts["customers"] = write(connection, t["customers"], customers())
+
+    barber_shares = zipf_weights(args.barbers, args.skew)
+    total_share = sum(barber_shares)
+    customer_cum = list(itertools.accumulate(zipf_weights(args.customers, args.skew)))
+    first_day = today - timedelta(days=365 * args.years)
+    days = (today + timedelta(days=args.future_days) - first_day).days
+
+    def appointments():
+        next_id = 1
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() == 6:
+                continue
+            demand = args.per_day * rng.uniform(0.7, 1.3)
+            for barber in range(args.barbers):
+                booked = min(SLOTS_PER_DAY, int(demand * barber_shares[barber] / total_share + rng.random()))
+                for slot in rng.sample(range(SLOTS_PER_DAY), booked):
+                    customer = rng.choices(range(1, args.customers + 1), cum_weights=customer_cum)[0]
+                    yield {"id_appointment": next_id, "id_customer": customer, "id_barber": barber + 1,
+                           "appointment_date": day, "start_time": slot_time(slot), "end_time": slot_time(slot + 1),
+                           "status": appointment_status(rng, day, today)}
+                    next_id += 1
+
+    counts["appointment"] = write(connection, t["appointment"], appointments())
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", required=True, help="sync SQLAlchemy URL of an empty database")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="preset sizes, overridden by the flags below")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"override the preset {name}")
+    parser.add_argument("--future-days", type=int, default=30, help="also book this many days ahead of --today")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for barber/customer/city popularity (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today(), help="date the history ends at")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    args = parser.parse_args()
+    for name, value in SCALES[args.scale].items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["ASYNC_MODE"] = "0"
+    sys.path.insert(0, SERVER_DIR)
+    import main as app_module
+
+    app_module.configure_database(app_module.settings)
+    engine = app_module.engine
+    if args.reset:
+        app_module.Base.metadata.drop_all(engine)
+    app_module.Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(app_module.User)).scalar():
+            sys.exit("The database already has data; use an empty one or pass --reset")
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        counts = generate(app_module, connection, random.Random(args.seed), args, args.today)
+        app_module.row_counters.rebuild(connection)
+    elapsed = time.perf_counter() - started
+    for table, count in counts.items():
+        print(f"{table:<16}{count:>12,}")
+    print(f"Seeded in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Read/write splitting checked locally, with two SQLite files standing in for
+the primary and a replica
+Run: python sqlite_replica.py [--replication-delay 2] [--max-lag 5]
+
+A background thread "replicates" by copying the primary file onto the
+replica file (sqlite3 backup) every --replication-delay seconds. The script
+starts a server with REPLICA_URLS set and checks that:
+  - a GET right after a write, without the read-your-writes cookie, reads
+    the replica and does not see the new row yet;
+  - the same GET with the cookie set by the write reads the primary and does;
+  - once replication stops for longer than --max-lag, the replica is taken
+    out of rotation and every read falls back to the primary.
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import httpx
+
+from common import seed_sqlite, start_server, stop_server
+
+PORT = 8021
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+def copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target, timeout=30) as dst:
+        src.backup(dst)
+
+
+def replicate(primary, replica, delay, stop):
+    while not stop.wait(delay):
+        copy_database(primary, replica)
+
+
+def wait_for(client, predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get("/admin/replicas").json()["replicas"][0]
+        if predicate(status):
+            return status
+        time.sleep(0.2)
+    raise RuntimeError(f"replica status did not change in {timeout}s: {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replication-delay", type=float, default=2)
+    parser.add_argument("--max-lag", type=float, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="barberian-replica-")
+    primary, replica = os.path.join(workdir, "primary.db"), os.path.join(workdir, "replica.db")
+    database_url = seed_sqlite(primary)
+    copy_database(primary, replica)
+
+    stop = threading.Event()
+    replicator = threading.Thread(target=replicate, args=(primary, replica, args.replication_delay, stop), daemon=True)
+    replicator.start()
+    server = start_server(database_url, PORT, REPLICA_URLS=f"sqlite:///{replica}",
+                          REPLICA_MAX_LAG=str(args.max_lag), REPLICA_CHECK_SECONDS="0.5")
+    try:
+        with httpx.Client(base_url=BASE_URL, timeout=30) as client:
+            status = wait_for(client, lambda status: status["serving"], args.max_lag + args.replication_delay * 2)
+            print(f"replica serving reads, lag {status['lag_seconds']}s")
+
+            created = client.post("/users/", json={"full_name": "Replica Check", "email": f"replica{time.time_ns()}@example.com",
+                                                   "password": "secret", "id_role": 1})
+            created.raise_for_status()
+            path = f"/users/{created.json()['id_user']}"
+            cookie = created.cookies.get("read_primary_until")
+            print(f"new user on a replica read: {httpx.get(BASE_URL + path).status_code} (expected 404: not replicated yet)")
+            print(f"new user with the read-your-writes cookie: {client.get(path).status_code} (expected 200, cookie={cookie})")
+
+            stop.set()
+            status = wait_for(client, lambda status: not status["serving"], args.max_lag + 5)
+            print(f"replication stopped: replica out of rotation ({status['lag_seconds']}s behind), reads on the primary")
+            print(f"new user without the cookie after the fallback: {httpx.get(BASE_URL + path).status_code} (expected 200)")
+    finally:
+        stop.set()
+        stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
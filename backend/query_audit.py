@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Query-plan audit: EXPLAIN every SELECT the API issues and flag full table scans
+Run: python query_audit.py [--sample-id 1] [--allow /stats]
+
+Every GET route of main.create_app() is called in-process against DATABASE_URL (MySQL
+or SQLite). The SELECT statements issued while serving each route are captured
+and EXPLAINed on the same database. A plan that reads a whole large table
+fails the audit with exit code 1 so new endpoints can't regress:
+  - MySQL: access type ALL, or a full index scan (type index) without LIMIT
+  - SQLite: SCAN <table> unless the query is bounded by a LIMIT with no sort
+"""
+
+import argparse
+import os
+import re
+import sys
+from collections import defaultdict
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server")
+
+# Tables that grow with traffic; scans of the small reference tables are fine
+LARGE_TABLES = {"appointment", "customers", "users", "barbers", "staff", "locations", "barbershops"}
+
+# Values for required query parameters, by name
+SAMPLE_QUERY_VALUES = {"appointment_date": "2024-01-01", "date_from": "2024-01-01", "date_to": "2024-03-31"}
+
+# Extra variants for routes whose filters are optional but mutually exclusive;
+# each is audited under its own template
+EXTRA_REQUESTS = [
+    "/availability/?appointment_date=2024-01-01&barbershop_id={id}",
+    "/availability/?appointment_date=2024-01-01&city_id={id}",
+    "/appointments/export?date_from=2024-01-01&date_to=2024-01-31",
+    "/appointments/export?barber_id={id}",
+    "/barbers/search?department_id={id}&genre_id={id}",
+    "/barbers/search?specialty_id={id}",
+    "/barbers/search?barbershop_id={id}&sort=id",
+    "/barbers/search?min_points=10",
+]
+
+# Readiness probe: issues no SQL and answers 503 until the lifespan warmup ran,
+# which the in-process client never starts; the slot stream never ends
+SKIPPED_ROUTES = {"/ready", "/availability/stream"}
+
+# Exports stream whole tables by design (their filtered variants above are
+# still audited)
+UNBOUNDED_ROUTES = {"/appointments/export", "/customers/export"}
+
+
+def load_app():
+    """(main module, app) for the environment settings, without async handlers"""
+    os.environ["ASYNC_MODE"] = "0"
+    sys.path.insert(0, SERVER_DIR)
+    import main
+    return main, main.create_app()
+
+
+def route_requests(app, sample_id):
+    """URLs to call for every GET route, with path and required query params filled in"""
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods or route.path in SKIPPED_ROUTES:
+            continue
+        path = re.sub(r"\{[^}]+\}", str(sample_id), route.path)
+        query = []
+        for param in route.dependant.query_params:
+            if param.required:
+                query.append(f"{param.alias}={SAMPLE_QUERY_VALUES.get(param.alias, sample_id)}")
+        if route.path == "/availability/":
+            query.append(f"barber_id={sample_id}")
+        paginated = any(param.alias == "cursor" for param in route.dependant.query_params)
+        if paginated:
+            query.append("limit=1")
+        yield route.path, path + ("?" + "&".join(query) if query else ""), paginated
+    for url in EXTRA_REQUESTS:
+        yield url, url.format(id=sample_id), False
+
+
+def capture_statements(main, app, sample_id):
+    """Run every route and collect the distinct SELECTs each one issued"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(main.engine, "before_cursor_execute", before_cursor_execute)
+    statements = defaultdict(dict)
+    client = TestClient(app)
+    try:
+        for route, url, paginated in route_requests(app, sample_id):
+            del captured[:]
+            response = client.get(url)
+            cursor = response.headers.get("X-Next-Cursor")
+            if paginated and cursor:
+                client.get(f"{url}&cursor={cursor}")
+            if response.status_code >= 500:
+                print(f"!! {url} -> {response.status_code}")
+            for statement, parameters in captured:
+                statements[route].setdefault(statement, parameters)
+    finally:
+        event.remove(main.engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def _base_table(name):
+    # joinedload aliases tables as users_1, citys_2, ...
+    return re.sub(r"_\d+$", "", name)
+
+
+def explain(connection, statement, parameters):
+    """Return (plan lines, violating tables) for one statement"""
+    bounded = re.search(r"\bLIMIT\b", statement, re.IGNORECASE) is not None
+    violations = []
+    lines = []
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        details = [row[-1] for row in rows]
+        sorts = any("USE TEMP B-TREE" in detail for detail in details)
+        for detail in details:
+            lines.append(detail)
+            match = re.match(r"SCAN (\w+)", detail)
+            if match and _base_table(match.group(1)) in LARGE_TABLES and (not bounded or sorts):
+                violations.append(_base_table(match.group(1)))
+    else:
+        result = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+        keys = list(result.keys())
+        for row in result.fetchall():
+            row = dict(zip(keys, row))
+            table, access = row.get("table") or "", row.get("type")
+            lines.append(f"{table}: type={access} key={row.get('key')} rows={row.get('rows')} {row.get('Extra') or ''}")
+            if _base_table(table) in LARGE_TABLES and (access == "ALL" or (access == "index" and not bounded)):
+                violations.append(_base_table(table))
+    return lines, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sample-id", type=int, default=1, help="id used for every path parameter")
+    parser.add_argument("--allow", action="append", default=[], help="route template allowed to scan (repeatable)")
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only the failing ones")
+    args = parser.parse_args()
+
+    app_module, app = load_app()
+    statements = capture_statements(app_module, app, args.sample_id)
+    failures = 0
+    with app_module.engine.connect() as connection:
+        for route in sorted(statements):
+            for statement, parameters in statements[route].items():
+                lines, violations = explain(connection, statement, parameters)
+                allowed = route in args.allow or route in UNBOUNDED_ROUTES
+                if violations and not allowed:
+                    failures += 1
+                if violations or args.verbose:
+                    verdict = "FULL SCAN" + (" (allowed)" if allowed else "") if violations else "ok"
+                    print(f"[{verdict}] {route}: {', '.join(sorted(set(violations))) or '-'}")
+                    print("    " + " ".join(statement.split())[:200])
+                    for line in lines:
+                        print(f"      {line}")
+
+    audited = sum(len(s) for s in statements.values())
+    print(f"\nAudited {audited} statements across {len(statements)} routes: {failures} full scan(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
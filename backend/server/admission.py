@@ -0,0 +1,177 @@
+"""
+Admission control for the request handlers.
+
+Every handler that can touch the database needs a pooled connection, and the
+sync ones a threadpool token as well. With more tokens than connections the
+surplus threads only block in pool checkout, holding a token each, and every
+request waits behind them. Admission keeps at most `limit` such requests in
+flight (the pool's size plus overflow, see settings.admission_limit) and
+parks the rest on the event loop, in one queue per lane:
+
+  booking  writes (POST/PUT/PATCH/DELETE), admitted first
+  browse   reads (GET/HEAD)
+
+A queued request that is not admitted within `queue_timeout` seconds, or
+that finds its lane's queue full, is rejected at once with 503 and
+Retry-After, instead of adding to everybody's latency.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request, status
+
+from database import pool_budget
+
+LANES = ("booking", "browse")
+READ_METHODS = ("GET", "HEAD")
+
+# Cheap status endpoints that must answer while the API is saturated
+EXEMPT_PATHS = ("/", "/health", "/ready", "/metrics")
+EXEMPT_PREFIXES = ("/admin/",)
+# Threadpool tokens beyond the admission limit, for those routes' sync handlers
+THREADPOOL_HEADROOM = 4
+
+
+def lane_of(method):
+    return "browse" if method in READ_METHODS else "booking"
+
+
+def admission_limit(settings):
+    """ADMISSION_LIMIT, or the connections one engine's pool can hand out"""
+    if settings.admission_limit:
+        return settings.admission_limit
+    pool_size, max_overflow = pool_budget(settings)
+    return pool_size + max_overflow
+
+
+def threadpool_tokens(settings):
+    if settings.threadpool_tokens:
+        return settings.threadpool_tokens
+    return admission_limit(settings) + THREADPOOL_HEADROOM
+
+
+def from_settings(settings):
+    return AdmissionController(
+        admission_limit(settings),
+        {"booking": settings.admission_booking_queue, "browse": settings.admission_browse_queue},
+        settings.admission_queue_timeout,
+        settings.admission_retry_after,
+    )
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionController:
+    """A counting semaphore whose waiters are served by lane priority, with bounded queues.
+    Only used from the event loop thread, so it needs no lock."""
+
+    def __init__(self, limit, queue_limits, queue_timeout, retry_after):
+        self.limit = limit
+        self.queue_limits = queue_limits
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.queues = {lane: deque() for lane in LANES}
+        self.admitted = dict.fromkeys(LANES, 0)
+        self.queued = dict.fromkeys(LANES, 0)
+        self.shed = dict.fromkeys(LANES, 0)
+        self.timed_out = dict.fromkeys(LANES, 0)
+
+    async def acquire(self, lane):
+        """Wait for a slot; raises Overloaded when the lane's queue is full or the wait times out"""
+        if self.active < self.limit and not any(self.queues.values()):
+            self.active += 1
+            self.admitted[lane] += 1
+            return
+        queue = self.queues[lane]
+        if len(queue) >= self.queue_limits[lane]:
+            self.shed[lane] += 1
+            raise Overloaded(f"{lane} queue is full")
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.queued[lane] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # release() handed the slot over just as the wait timed out
+                self.release()
+            else:
+                queue.remove(waiter)
+                waiter.cancel()
+            self.timed_out[lane] += 1
+            raise Overloaded(f"no slot within {self.queue_timeout}s") from None
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if waiter.done():
+                self.release()
+            else:
+                queue.remove(waiter)
+                waiter.cancel()
+            raise
+        self.admitted[lane] += 1
+
+    def release(self):
+        """Hand the slot to the first waiter of the highest lane, or free it"""
+        for lane in LANES:
+            queue = self.queues[lane]
+            if queue:
+                queue.popleft().set_result(None)
+                return
+        self.active -= 1
+
+    def exempt(self, path):
+        return path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES)
+
+    def rejection(self, exc):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server busy ({exc}), retry later",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    @asynccontextmanager
+    async def admit(self, lane):
+        """Hold a slot for the block; for handlers that admit only their database steps"""
+        try:
+            await self.acquire(lane)
+        except Overloaded as exc:
+            raise self.rejection(exc)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def hold(self, lane):
+        """Take a slot for a response that outlives its handler (a streamed body);
+        returns the callback that releases it"""
+        try:
+            await self.acquire(lane)
+        except Overloaded as exc:
+            raise self.rejection(exc)
+        return self.release
+
+    async def __call__(self, request: Request):
+        """Route dependency: holds a slot for the whole request, response included"""
+        if self.exempt(request.url.path):
+            yield
+            return
+        async with self.admit(lane_of(request.method)):
+            yield
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_timeout": self.queue_timeout,
+            "lanes": {
+                lane: {"queued_now": len(self.queues[lane]), "queue_limit": self.queue_limits[lane],
+                       "admitted": self.admitted[lane], "queued": self.queued[lane],
+                       "shed": self.shed[lane], "timed_out": self.timed_out[lane]}
+                for lane in LANES
+            },
+        }
@@ -0,0 +1,56 @@
+"""
+Interval arithmetic for barber availability.
+
+Times are handled as minutes since midnight. Busy intervals are sorted and
+merged once, then subtracted from the working hours in a single pass, so a
+day costs O(n log n) in the number of appointments that day.
+"""
+
+from datetime import time
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def merge(intervals):
+    """Sort and merge overlapping or touching (start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_intervals(open_start, open_end, busy):
+    """The parts of [open_start, open_end) not covered by any busy interval"""
+    free = []
+    cursor = open_start
+    for start, end in merge(busy):
+        if end <= cursor:
+            continue
+        if start >= open_end:
+            break
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < open_end:
+        free.append((cursor, open_end))
+    return free
+
+
+def split_slots(free, slot_minutes):
+    """Cut free intervals into bookable slots of slot_minutes each"""
+    slots = []
+    for start, end in free:
+        while start + slot_minutes <= end:
+            slots.append((start, start + slot_minutes))
+            start += slot_minutes
+    return slots
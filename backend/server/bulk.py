@@ -0,0 +1,97 @@
+"""
+Bulk creation: validate a list payload item by item, insert the valid rows
+with batched multi-row INSERTs in one transaction and report the generated
+ids and per-item errors, indexed like the request body.
+
+Foreign keys and unique columns are checked up front with one IN query per
+column, so a bad item is reported instead of failing the whole statement.
+"""
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+BULK_BATCH_SIZE = 500
+BULK_MAX_ITEMS = 10000
+
+
+def chunks(values, size=BULK_BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class BulkInsert:
+    def __init__(self, table, size):
+        self.table = table
+        self.rows = {}
+        self.errors = {}
+        self.size = size
+
+    def fail(self, index, message):
+        self.rows.pop(index, None)
+        self.errors.setdefault(index, []).append(message)
+
+    def validate(self, schema, items, prepare=None):
+        for index, item in enumerate(items):
+            try:
+                values = schema.model_validate(item).model_dump()
+            except ValidationError as exc:
+                for error in exc.errors():
+                    self.fail(index, f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+                continue
+            self.rows[index] = prepare(values) if prepare is not None else values
+
+    def _existing(self, connection, column, values):
+        found = set()
+        for batch in chunks(values):
+            found.update(connection.execute(select(column).where(column.in_(batch))).scalars())
+        return found
+
+    def check_references(self, connection):
+        """Every foreign key value must exist in the referenced table"""
+        for fk in self.table.foreign_keys:
+            name = fk.parent.key
+            values = {row[name] for row in self.rows.values() if row.get(name) is not None}
+            missing = values - self._existing(connection, fk.column, values)
+            for index, row in list(self.rows.items()):
+                if row.get(name) in missing:
+                    self.fail(index, f"{name}: {row[name]} does not exist")
+
+    def check_unique(self, connection):
+        """Unique columns may clash neither with stored rows nor within the payload"""
+        for column in self.table.columns:
+            if not column.unique:
+                continue
+            name = column.key
+            values = {row[name] for row in self.rows.values() if row.get(name) is not None}
+            taken = self._existing(connection, column, values)
+            seen = set()
+            for index, row in list(self.rows.items()):
+                value = row.get(name)
+                if value in taken:
+                    self.fail(index, f"{name}: {value} already exists")
+                elif value is not None and value in seen:
+                    self.fail(index, f"{name}: {value} is repeated in the request")
+                seen.add(value)
+
+    def insert(self, connection):
+        """Insert the remaining rows; returns the new primary keys, aligned with the request"""
+        pk = self.table.primary_key.columns.values()[0]
+        ids = [None] * self.size
+        for batch in chunks(sorted(self.rows)):
+            # One multi-row INSERT ... VALUES per batch. Its auto-increment ids
+            # ascend in VALUES order: with RETURNING they only need sorting;
+            # MySQL has none, but InnoDB reserves one consecutive block for
+            # such a "simple insert" and lastrowid is its first id.
+            statement = insert(self.table).values([self.rows[index] for index in batch])
+            if connection.dialect.insert_returning:
+                new_ids = sorted(connection.execute(statement.returning(pk)).scalars())
+            else:
+                first = connection.execute(statement).lastrowid
+                new_ids = range(first, first + len(batch))
+            for index, new_id in zip(batch, new_ids):
+                ids[index] = new_id
+        return ids
+
+    def error_list(self):
+        return [{"index": index, "errors": messages} for index, messages in sorted(self.errors.items())]
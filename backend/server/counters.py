@@ -0,0 +1,98 @@
+"""
+Incrementally maintained row counters for /stats.
+
+Each counted table has SHARDS rows in the counters table; a flush adds its
+inserts/deletes to one random shard per table, so concurrent writers rarely
+touch the same row. Reading all counts is a single GROUP BY over a few dozen
+rows. The counters table is created by migration 2. Without it nothing is
+written and read() returns None, as it does while rebuild() has not created
+the shard rows yet; /stats then counts every table exactly. Counters that
+have missed writes, such as writes made before a server restart that picked
+up the table, are repaired by rebuild().
+"""
+
+import random
+from collections import Counter
+
+from sqlalchemy import delete, event, func, select, update
+
+from database import TablePresence
+
+SHARDS = 16
+
+
+class RowCounters:
+    def __init__(self, counter_model, counted):
+        # counted: {"users": User, ...} in the order /stats reports them
+        self.table = counter_model.__table__
+        self.counted = counted
+        self._names = {model: name for name, model in counted.items()}
+        self.present = TablePresence(self.table, migration=2)
+
+    def install(self, session_class):
+        """Keep the counters in step with every ORM flush on `session_class`"""
+        event.listen(session_class, "after_flush", self._after_flush)
+
+    def _after_flush(self, session, flush_context):
+        deltas = Counter()
+        for obj in session.new:
+            name = self._names.get(type(obj))
+            if name is not None:
+                deltas[name] += 1
+        for obj in session.deleted:
+            name = self._names.get(type(obj))
+            if name is not None:
+                deltas[name] -= 1
+        if deltas:
+            self.add(session.connection(), deltas)
+
+    def add(self, connection, deltas):
+        """Apply {name: delta} in the caller's transaction (for Core bulk writes)"""
+        if not self.present(connection):
+            return
+        shard = random.randrange(SHARDS)
+        for name, delta in deltas.items():
+            if delta:
+                connection.execute(
+                    update(self.table)
+                    .where(self.table.c.name == name, self.table.c.shard == shard)
+                    .values(row_count=self.table.c.row_count + delta)
+                )
+
+    def add_rows(self, connection, model, delta):
+        """add() keyed by model; no-op for tables that are not counted"""
+        name = self._names.get(model)
+        if name is not None:
+            self.add(connection, {name: delta})
+
+    def read(self, connection):
+        """Counts from the counters table, or None if it was never built"""
+        if not self.present(connection):
+            return None
+        rows = connection.execute(
+            select(self.table.c.name, func.sum(self.table.c.row_count)).group_by(self.table.c.name)
+        ).all()
+        counts = {name: int(total) for name, total in rows}
+        if any(name not in counts for name in self.counted):
+            return None
+        return {name: counts[name] for name in self.counted}
+
+    def exact(self, connection):
+        """COUNT(*) of every counted table, in one round trip"""
+        columns = [
+            select(func.count()).select_from(model).scalar_subquery().label(name)
+            for name, model in self.counted.items()
+        ]
+        return dict(connection.execute(select(*columns)).one()._mapping)
+
+    def rebuild(self, connection):
+        """Reset the counters to the exact counts (also repairs any drift)"""
+        counts = self.exact(connection)
+        self.present.mark_present(connection)
+        connection.execute(delete(self.table))
+        connection.execute(self.table.insert(), [
+            {"name": name, "shard": shard, "row_count": counts[name] if shard == 0 else 0}
+            for name in self.counted
+            for shard in range(SHARDS)
+        ])
+        return counts
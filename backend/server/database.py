@@ -0,0 +1,147 @@
+"""
+Engine construction for the sync and async database paths.
+"""
+
+import logging
+import os
+import weakref
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument
+from replicas import Replica, ReplicaSet
+
+logger = logging.getLogger("barberian.database")
+
+# Sync driver -> async driver used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+# Every engine built in this process, so a forked child can drop their pools
+_engines = weakref.WeakSet()
+
+
+def _reset_pools_after_fork():
+    # The child inherits the parent's pooled sockets; sharing them would
+    # interleave both processes' traffic on one connection. close=False
+    # forgets them without closing, which would also close the parent's.
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+def pool_budget(settings):
+    """(pool_size, max_overflow) per engine, so that all workers' pools together
+    stay within DB_MAX_CONNECTIONS; the configured sizes when it is not set.
+    Each replica is its own server, so it gets the same budget as the primary."""
+    if not settings.db_max_connections:
+        return settings.pool_size, settings.max_overflow
+    engines = 2 if settings.async_mode else 1
+    per_engine = settings.db_max_connections // (settings.workers * engines)
+    if per_engine < 1:
+        raise ValueError(
+            f"DB_MAX_CONNECTIONS={settings.db_max_connections} is less than one connection "
+            f"per engine for {settings.workers} worker(s) x {engines} engine(s)"
+        )
+    pool_size = min(settings.pool_size, per_engine)
+    return pool_size, min(settings.max_overflow, per_engine - pool_size)
+
+
+def _connect_args(url):
+    # SQLite connections are handed between threadpool workers
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    return {}
+
+
+def _pool_args(url, settings, poolclass):
+    url = make_url(url)
+    # In-memory SQLite needs its single shared connection, not a QueuePool
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    pool_size, max_overflow = pool_budget(settings)
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_recycle": settings.pool_recycle,
+        "pool_pre_ping": settings.pool_pre_ping,
+    }
+
+
+def _with_async_driver(url, hint):
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername)
+    if drivername is None:
+        raise ValueError(f"No async driver known for {url.drivername!r}; {hint}")
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def async_url(settings):
+    """The URL the AsyncEngine connects to"""
+    if settings.async_database_url:
+        return settings.async_database_url
+    return _with_async_driver(settings.database_url, "set ASYNC_DATABASE_URL")
+
+
+def build_engine(settings, url=None):
+    url = url or settings.database_url
+    engine = create_engine(url, connect_args=_connect_args(url), **_pool_args(url, settings, InstrumentedQueuePool))
+    instrument(engine)
+    _engines.add(engine)
+    return engine
+
+
+def build_async_engine(settings, url=None):
+    url = url or async_url(settings)
+    engine = create_async_engine(url, connect_args=_connect_args(url), **_pool_args(url, settings, InstrumentedAsyncAdaptedQueuePool))
+    instrument(engine.sync_engine)
+    _engines.add(engine.sync_engine)
+    return engine
+
+
+def build_replicas(settings, heartbeat):
+    """A ReplicaSet over REPLICA_URLS, or None when no replica is configured"""
+    if not settings.replica_urls:
+        return None
+    replicas = []
+    for url in settings.replica_urls:
+        async_engine = None
+        if settings.async_mode:
+            async_engine = build_async_engine(settings, _with_async_driver(url, "REPLICA_URLS needs a driver listed in ASYNC_DRIVERS"))
+        name = make_url(url).render_as_string(hide_password=True)
+        replicas.append(Replica(name, build_engine(settings, url), async_engine))
+    return ReplicaSet(replicas, heartbeat, settings.replica_selection, settings.replica_max_lag, settings.replica_check_seconds)
+
+
+class TablePresence:
+    """Whether a table created by a migration exists, checked once per engine.
+    A server started before the migration keeps its answer until restarted."""
+
+    def __init__(self, table, migration):
+        self.table = table
+        self.migration = migration
+        self._present = weakref.WeakKeyDictionary()
+
+    def __call__(self, connection):
+        engine = connection.engine
+        present = self._present.get(engine)
+        if present is None:
+            present = self._present[engine] = inspect(connection).has_table(self.table.name)
+            if not present:
+                logger.warning("Table %s is missing (migration %s); it is not maintained or read until then",
+                               self.table.name, self.migration)
+        return present
+
+    def mark_present(self, connection):
+        self._present[connection.engine] = True
@@ -0,0 +1,93 @@
+"""
+Streaming exports (NDJSON or CSV) with constant memory.
+
+The SELECT runs on its own connection with stream_results, so MySQL hands
+rows over through a server-side cursor instead of buffering the whole result
+in the client, and yield_per fetches it in fixed-size partitions. Each
+partition is encoded into one chunk of the response body and dropped, so
+memory stays flat however many rows the export has.
+
+The connection is held until the last chunk is sent, so the handler's
+admission slot is handed to the response and released only when the body
+is done or the client went away.
+"""
+
+import csv
+import io
+from enum import Enum
+
+import anyio
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+EXPORT_CHUNK_ROWS = 1000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _csv_value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(keys, rows):
+    return b"".join(orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+def stream_rows(engine, statement, export_format, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the encoded result of `statement`, one chunk per partition of rows"""
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_rows).execute(statement)
+        keys = list(result.keys())
+        if export_format == "csv":
+            yield _encode_csv([keys])
+        for rows in result.partitions():
+            yield _encode_csv(rows) if export_format == "csv" else _encode_ndjson(keys, rows)
+
+
+class ExportResponse(StreamingResponse):
+    """StreamingResponse over a stream_rows() generator that closes it, returning
+    its connection, and then calls `release` once the body is sent or abandoned"""
+
+    def __init__(self, rows, release=None, **kwargs):
+        super().__init__(rows, **kwargs)
+        self.rows = rows
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # Starlette leaves an unfinished body iterator to the garbage collector.
+                # Shielded, so a request cancelled at shutdown still returns the connection
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(self.rows.close)
+            except ValueError:
+                # Still running in its thread; its connection returns when it is collected
+                pass
+            finally:
+                if self.release is not None:
+                    self.release()
+
+
+def export_response(engine, statement, export_format, name, release=None):
+    """Response downloading `statement` as <name>.ndjson / <name>.csv; `release`
+    frees the caller's admission slot when the stream ends"""
+    return ExportResponse(
+        stream_rows(engine, statement, export_format),
+        release,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
@@ -0,0 +1,52 @@
+"""
+Eager-loading plans derived from the Pydantic response schemas.
+
+Every relationship in main.py is lazy, so serializing a nested response model
+fires one SELECT per related object. loader_options() walks a response schema,
+finds the fields that map to ORM relationships and returns the matching
+joinedload/selectinload options, so a page costs a constant number of queries.
+"""
+
+import typing
+from functools import lru_cache
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def schema_of(annotation):
+    """Return the Pydantic model wrapped in Optional[...] / List[...], if any"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        schema = schema_of(arg)
+        if schema is not None:
+            return schema
+    return None
+
+
+def _plan(model, schema, parent=None):
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in schema.model_fields.items():
+        nested = schema_of(field.annotation)
+        if nested is None or name not in relationships:
+            continue
+        prop = relationships[name]
+        attr = getattr(model, name)
+        # Many-to-one rides along in the main query; collections get one
+        # extra SELECT ... WHERE fk IN (...) per relationship path.
+        if parent is None:
+            loader = selectinload(attr) if prop.uselist else joinedload(attr)
+        else:
+            loader = parent.selectinload(attr) if prop.uselist else parent.joinedload(attr)
+        options.append(loader)
+        options.extend(_plan(prop.mapper.class_, nested, loader))
+    return options
+
+
+@lru_cache(maxsize=None)
+def loader_options(model, schema):
+    """Loader options that eagerly fetch everything `schema` serializes from `model`"""
+    return tuple(_plan(model, schema))
@@ -0,0 +1,33 @@
+"""
+In-process lock striping.
+
+A fixed array of asyncio locks indexed by the hash of a key gives per-key
+mutual exclusion without keeping one lock object per key alive forever.
+Waiters are parked on the event loop, so they hold neither a threadpool
+slot nor a pooled database connection while they queue.
+"""
+
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+
+
+class StripedLock:
+    def __init__(self, stripes=64):
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+
+    def _stripe(self, key):
+        return hash(key) % len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key):
+        async with self._locks[self._stripe(key)]:
+            yield
+
+    @asynccontextmanager
+    async def hold_many(self, keys):
+        """Hold the stripes of all `keys`, taken in stripe order so that two
+        holders of overlapping sets cannot deadlock each other"""
+        async with AsyncExitStack() as stack:
+            for stripe in sorted({self._stripe(key) for key in keys}):
+                await stack.enter_async_context(self._locks[stripe])
+            yield
@@ -0,0 +1,152 @@
+"""
+Versioned schema migrations.
+Run: python migrations.py   (uses DATABASE_URL, see settings.py)
+
+Applied versions are recorded in the schema_migrations table. Index steps
+skip indexes that already exist, so a database created from the current
+barbarian-db.sql (which declares them) is simply marked as migrated. Other
+steps are plain functions of the connection and must be safe to re-run.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    table: str
+    name: str
+    columns: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    indexes: List[IndexSpec] = field(default_factory=list)
+    steps: List[Callable] = field(default_factory=list)
+
+
+def build_table_counters(connection):
+    from main import TableCounter, row_counters
+
+    TableCounter.__table__.create(connection, checkfirst=True)
+    counts = row_counters.rebuild(connection)
+    print("  + table_counters (" + ", ".join(f"{name}={count}" for name, count in counts.items()) + ")")
+
+
+def drop_single_column_barber_indexes(connection):
+    # idx_barber_city_rank / idx_barber_barbershop_rank start with the same column
+    existing = {index["name"] for index in inspect(connection).get_indexes("barbers")}
+    for name in ("idx_barber_city", "idx_barber_barbershop"):
+        if name in existing:
+            on_table = " ON barbers" if connection.dialect.name == "mysql" else ""
+            connection.execute(text(f"DROP INDEX {name}{on_table}"))
+            print(f"  - barbers.{name}")
+
+
+def build_appointment_rollups(connection):
+    from main import AppointmentRollup, occupancy_rollup
+
+    AppointmentRollup.__table__.create(connection, checkfirst=True)
+    print(f"  + appointment_rollups ({occupancy_rollup.rebuild(connection)} barber-days)")
+
+
+def create_job_leases(connection):
+    from main import JobLease
+
+    JobLease.__table__.create(connection, checkfirst=True)
+    print("  + job_leases")
+
+
+def create_replica_heartbeat(connection):
+    from main import ReplicaHeartbeat
+
+    ReplicaHeartbeat.__table__.create(connection, checkfirst=True)
+    print("  + replica_heartbeat")
+
+
+MIGRATIONS = [
+    Migration(1, "Indexes for the hot API access paths", [
+        # GET /appointments/ keyset order
+        IndexSpec("appointment", "idx_appointment_schedule", ("appointment_date", "start_time", "id_appointment")),
+        # by-barber listings, availability and booking overlap checks
+        IndexSpec("appointment", "idx_appointment_barber_day", ("id_barber", "appointment_date", "start_time")),
+        # GET /appointments/by-customer/{id}
+        IndexSpec("appointment", "idx_appointment_customer_day", ("id_customer", "appointment_date", "start_time")),
+        # GET /barbers/by-city/{id}, availability by city / barbershop
+        IndexSpec("barbers", "idx_barber_city", ("id_city",)),
+        IndexSpec("barbers", "idx_barber_barbershop", ("id_barbershop",)),
+        # GET /cities/by-department/{id}
+        IndexSpec("citys", "idx_city_department", ("id_department",)),
+        # GET /staff/by-barber/{id}
+        IndexSpec("staff", "idx_staff_barber", ("id_barber",)),
+        # users.email lookups are served by the UNIQUE constraint's index
+    ]),
+    Migration(2, "Row counters for /stats", steps=[build_table_counters]),
+    Migration(3, "Heartbeat table for replica lag", steps=[create_replica_heartbeat]),
+    Migration(4, "Ranked indexes for /barbers/search", [
+        IndexSpec("barbers", "idx_barber_city_rank", ("id_city", "points", "id_barber")),
+        IndexSpec("barbers", "idx_barber_department_rank", ("id_department", "points", "id_barber")),
+        IndexSpec("barbers", "idx_barber_specialty_rank", ("id_specialty", "points", "id_barber")),
+        IndexSpec("barbers", "idx_barber_barbershop_rank", ("id_barbershop", "points", "id_barber")),
+        IndexSpec("barbers", "idx_barber_rank", ("points", "id_barber")),
+    ], steps=[drop_single_column_barber_indexes]),
+    Migration(5, "Per-barber daily occupancy rollups", steps=[build_appointment_rollups]),
+    Migration(6, "Leases for background jobs", steps=[create_job_leases]),
+]
+
+
+def applied_versions(connection):
+    metadata.create_all(connection, tables=[schema_migrations])
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _create_index(connection, spec):
+    existing = {index["name"] for index in inspect(connection).get_indexes(spec.table)}
+    if spec.name in existing:
+        return False
+    connection.execute(text(f"CREATE INDEX {spec.name} ON {spec.table} ({', '.join(spec.columns)})"))
+    return True
+
+
+def migrate(engine):
+    """Apply every pending migration in version order; returns the versions applied"""
+    applied = []
+    with engine.connect() as connection:
+        done = applied_versions(connection)
+        connection.commit()
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in done:
+                continue
+            for spec in migration.indexes:
+                if _create_index(connection, spec):
+                    print(f"  + {spec.table}.{spec.name} ({', '.join(spec.columns)})")
+            for step in migration.steps:
+                step(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=migration.version, description=migration.description, applied_at=datetime.utcnow()))
+            connection.commit()
+            applied.append(migration.version)
+    return applied
+
+
+if __name__ == "__main__":
+    from database import build_engine
+    from settings import Settings
+
+    versions = migrate(build_engine(Settings.from_env()))
+    print(f"Applied migrations: {versions}" if versions else "Schema is up to date")
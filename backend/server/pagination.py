@@ -0,0 +1,95 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+offset(skip) makes the database walk and discard every skipped row, so deep
+pages get slower and slower. A cursor instead remembers the sort key of the
+last row served and the next page seeks straight past it using the index.
+Cursors are opaque to clients: base64 of the JSON-encoded key values.
+Keys are columns, or column.desc() for a descending sort key.
+"""
+
+import base64
+import json
+from datetime import date, time
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import operators
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _descending(key):
+    return getattr(key, "modifier", None) is operators.desc_op
+
+
+def key_column(key):
+    """The column a sort key orders by (the column itself or the one under .desc())"""
+    return key.element if _descending(key) else key
+
+
+def _encode_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(key, value):
+    python_type = key_column(key).type.python_type
+    if python_type in (date, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(row, keys):
+    """Build the cursor pointing just past `row`"""
+    values = [_encode_value(getattr(row, key_column(key).key)) for key in keys]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, keys):
+    """Turn a cursor back into key values, rejecting anything malformed with 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [_decode_value(key, value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(keys, values):
+    # Expanded form of (k1, k2, ...) > (v1, v2, ...); MySQL only turns the
+    # OR-of-ANDs shape into an index range scan reliably.
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [key_column(keys[j]) == values[j] for j in range(i)]
+        past = key_column(key) < values[i] if _descending(key) else key_column(key) > values[i]
+        clauses.append(and_(*equal, past))
+    return or_(*clauses)
+
+
+def paginate(query, keys, skip, limit, cursor=None):
+    """Order `query` by `keys` and apply either the cursor seek or skip/limit"""
+    query = query.order_by(*keys)
+    if cursor:
+        query = query.where(_after(keys, decode_cursor(cursor, keys)))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def next_cursor(rows, keys, limit):
+    """The cursor for the following page, or None when this page was not full"""
+    if rows and len(rows) == limit:
+        return encode_cursor(rows[-1], keys)
+    return None
+
+
+def set_next_cursor(response, rows, keys, limit):
+    """Expose the cursor for the following page when this one came back full"""
+    cursor = next_cursor(rows, keys, limit)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,226 @@
+"""
+Password hashing on a dedicated process pool.
+
+A hash that resists guessing costs tens to hundreds of milliseconds of CPU.
+Run inline, every signup or login would hold a threadpool slot and the GIL
+for that long, so the handlers await PasswordHasher instead: the work runs
+in PASSWORD_WORKERS spawned processes while the event loop keeps serving.
+At most PASSWORD_QUEUE hashes wait or run per worker process; beyond that a
+request is turned away with 503 rather than queued behind the burst.
+
+Stored formats:
+
+  $scrypt$ln=14,r=8,p=1$<salt>$<key>   hashlib.scrypt, N = 2**ln (default)
+  $2b$12$...                           bcrypt (the seeded accounts of barbarian-db.sql)
+  anything else                        a legacy plaintext password
+
+PASSWORD_COST is the log2 work factor of PASSWORD_SCHEME: scrypt's ln or
+bcrypt's rounds. A successful login whose stored hash uses another scheme
+or cost, or is still plaintext, returns a fresh hash to store in its place
+(check()), so raising the cost upgrades accounts as their users log in.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import bcrypt
+except ImportError:  # in requirements.txt; without it bcrypt hashes cannot be verified
+    bcrypt = None
+
+logger = logging.getLogger("barberian.passwords")
+
+SCHEMES = ("scrypt", "bcrypt")
+DEFAULT_COST = {"scrypt": 14, "bcrypt": 12}
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+# bcrypt only reads the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+
+class Busy(Exception):
+    pass
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, ln, r, p):
+    # scrypt needs 128 * r * N bytes; hashlib refuses more than 32 MiB by default
+    return hashlib.scrypt(password.encode(), salt=salt, n=2 ** ln, r=r, p=p,
+                          maxmem=256 * r * 2 ** ln + 2 ** 20, dklen=KEY_BYTES)
+
+
+def scheme_of(stored):
+    if stored.startswith("$scrypt$"):
+        return "scrypt"
+    if stored.startswith(("$2a$", "$2b$", "$2y$")):
+        return "bcrypt"
+    return "plain"
+
+
+def cost_of(stored):
+    scheme = scheme_of(stored)
+    if scheme == "scrypt":
+        params = dict(item.split("=") for item in stored.split("$")[2].split(","))
+        return int(params["ln"]), int(params["r"]), int(params["p"])
+    if scheme == "bcrypt":
+        return int(stored.split("$")[2])
+    return None
+
+
+def hash_password(password, scheme, cost):
+    """The stored form of `password`; CPU-bound, runs in a pool process"""
+    if scheme == "bcrypt":
+        return bcrypt.hashpw(password.encode()[:BCRYPT_MAX_BYTES], bcrypt.gensalt(cost)).decode()
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, cost, SCRYPT_R, SCRYPT_P)
+    return f"$scrypt$ln={cost},r={SCRYPT_R},p={SCRYPT_P}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password, stored):
+    scheme = scheme_of(stored)
+    if scheme == "scrypt":
+        ln, r, p = cost_of(stored)
+        salt, key = stored.split("$")[3:5]
+        return hmac.compare_digest(_scrypt(password, _b64decode(salt), ln, r, p), _b64decode(key))
+    if scheme == "bcrypt":
+        return bcrypt.checkpw(password.encode()[:BCRYPT_MAX_BYTES], stored.encode())
+    return hmac.compare_digest(password.encode(), stored.encode())
+
+
+def needs_rehash(stored, scheme, cost):
+    if scheme_of(stored) != scheme:
+        return True
+    if scheme == "scrypt":
+        return cost_of(stored) != (cost, SCRYPT_R, SCRYPT_P)
+    return cost_of(stored) != cost
+
+
+def check_password(password, stored, scheme, cost):
+    """(matches, replacement): replacement is a new hash when the stored one is outdated"""
+    if not verify_password(password, stored):
+        return False, None
+    if needs_rehash(stored, scheme, cost):
+        return True, hash_password(password, scheme, cost)
+    return True, None
+
+
+def from_settings(settings):
+    # By default the server's worker processes share the CPUs between their pools
+    workers = settings.password_workers or max(1, (os.cpu_count() or 1) // settings.workers)
+    return PasswordHasher(settings.password_scheme, settings.password_cost, workers, settings.password_queue)
+
+
+class PasswordHasher:
+    def __init__(self, scheme="scrypt", cost=None, workers=1, queue=16):
+        if scheme not in SCHEMES:
+            raise ValueError(f"PASSWORD_SCHEME must be one of {', '.join(SCHEMES)}")
+        if scheme == "bcrypt" and bcrypt is None:
+            raise ValueError("PASSWORD_SCHEME=bcrypt needs the bcrypt package (pip install bcrypt)")
+        self.scheme = scheme
+        self.cost = cost or DEFAULT_COST[scheme]
+        self.workers = workers
+        self.limit = workers * queue
+        self.pool = None
+        self.in_flight = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self._dummy = None
+
+    def start(self):
+        # Spawned, not forked: the server process already runs threads and an event loop
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def warm(self):
+        """Start the pool and hash the stand-in that unknown users are checked against"""
+        self._dummy = await self.hash("")
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def _run(self, function, *args):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise Busy("password hashing queue is full")
+        self.start()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password):
+        hashed = await self._run(hash_password, password, self.scheme, self.cost)
+        self.hashed += 1
+        return hashed
+
+    async def hash_many(self, passwords):
+        """Hashes of `passwords` in order (None stays None). At most one per pool
+        process runs at a time, so logins are not queued behind a large batch."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+
+        async def one(password):
+            if password is None:
+                return None
+            async with slots:
+                self.in_flight += 1
+                try:
+                    hashed = await loop.run_in_executor(self.pool, hash_password, password, self.scheme, self.cost)
+                finally:
+                    self.in_flight -= 1
+            self.hashed += 1
+            return hashed
+
+        return await asyncio.gather(*(one(password) for password in passwords))
+
+    async def check(self, password, stored):
+        """(matches, replacement) for a login; see check_password"""
+        self.verified += 1
+        if stored is None:
+            # Unknown user or no password: spend the same time as a real check,
+            # so the response time does not tell which emails have accounts
+            if self._dummy is None:
+                self._dummy = await self.hash("")
+            await self._run(verify_password, password, self._dummy)
+            return False, None
+        if scheme_of(stored) == "bcrypt" and bcrypt is None:
+            logger.warning("Cannot verify a bcrypt password hash: the bcrypt package is not installed")
+            return False, None
+        matches, replacement = await self._run(check_password, password, stored, self.scheme, self.cost)
+        if replacement is not None:
+            self.rehashed += 1
+        return matches, replacement
+
+    def stats(self):
+        return {
+            "scheme": self.scheme,
+            "cost": self.cost,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "limit": self.limit,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+        }
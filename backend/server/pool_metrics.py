@@ -0,0 +1,133 @@
+"""
+Connection pool instrumentation.
+
+The pool classes below time every checkout (including the time spent queued
+waiting for a free connection) and count checkout timeouts. Pool event
+listeners attached to the engine count connects, checkouts, checkins and
+invalidations. pool_stats() combines both with the live pool status.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (ms) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Counters and checkout wait histogram for one engine's pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self._buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe_wait(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum_ms += ms
+            self.wait_max_ms = max(self.wait_max_ms, ms)
+            self._buckets[bisect_left(WAIT_BUCKETS_MS, ms)] += 1
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def wait_histogram(self):
+        """Cumulative bucket counts keyed by upper bound, Prometheus style"""
+        with self._lock:
+            buckets = list(self._buckets)
+        histogram, total = {}, 0
+        for bound, count in zip(WAIT_BUCKETS_MS + ("+Inf",), buckets):
+            total += count
+            histogram[str(bound)] = total
+        return histogram
+
+    def attach(self, engine):
+        """Register the pool event listeners on `engine`"""
+        event.listen(engine, "connect", lambda *args: self.increment("connects"))
+        event.listen(engine, "checkout", lambda *args: self.increment("checkouts"))
+        event.listen(engine, "checkin", lambda *args: self.increment("checkins"))
+        event.listen(engine, "invalidate", lambda *args: self.increment("invalidations"))
+
+
+class _InstrumentedPoolMixin:
+    metrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.increment("timeouts")
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting to the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine):
+    """Attach a PoolMetrics to `engine` (built with an instrumented pool class)"""
+    metrics = PoolMetrics()
+    engine.pool.metrics = metrics
+    metrics.attach(engine)
+    return metrics
+
+
+def pool_stats(engine):
+    """Live pool status plus the collected counters, as a JSON-able dict"""
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # overflow() is negative while the pool is still below pool_size
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(
+            connects=metrics.connects,
+            checkouts=metrics.checkouts,
+            checkins=metrics.checkins,
+            invalidations=metrics.invalidations,
+            timeouts=metrics.timeouts,
+            checkout_wait_ms={
+                "count": metrics.wait_count,
+                "sum": round(metrics.wait_sum_ms, 3),
+                "max": round(metrics.wait_max_ms, 3),
+                "buckets": metrics.wait_histogram(),
+            },
+        )
+    return stats
@@ -0,0 +1,153 @@
+"""
+Sparse fieldsets for the list endpoints (?fields= / ?include=).
+
+    ?fields=id_appointment,appointment_date,barber.user.full_name
+    ?include=customer,barber.city
+
+`fields` lists the columns to return as dotted paths through the response
+schema; naming a relationship returns all of its columns. `include` adds
+relationships (and every relationship on the way to them) with all their
+columns; without `fields` every top-level column is returned as well. Only names that the response schema exposes are
+accepted. The projection is compiled into one Core SELECT with an outer join
+per relationship, and the rows are turned into plain dicts and rendered with
+orjson, skipping ORM objects and Pydantic validation entirely.
+"""
+
+from functools import lru_cache
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import aliased
+
+from loading import schema_of
+from pagination import NEXT_CURSOR_HEADER, key_column, next_cursor, paginate
+
+
+def _split(value):
+    return tuple(path.strip() for path in (value or "").split(",") if path.strip())
+
+
+class _Node:
+    def __init__(self, model, schema, all_columns):
+        self.model = model
+        self.schema = schema
+        self.all_columns = all_columns
+        self.columns = []
+        self.children = {}
+
+    def child(self, name, path):
+        field = self.schema.model_fields.get(name)
+        nested = schema_of(field.annotation) if field is not None else None
+        relationships = inspect(self.model).relationships
+        if nested is None or name not in relationships:
+            raise HTTPException(status_code=400, detail=f"Unknown relationship '{path}'")
+        prop = relationships[name]
+        if prop.uselist:
+            raise HTTPException(status_code=400, detail=f"'{path}' is a collection and cannot be projected")
+        if name not in self.children:
+            self.children[name] = _Node(prop.mapper.class_, nested, False)
+        return self.children[name]
+
+    def column_names(self):
+        mapped = inspect(self.model).columns
+        names = self.columns
+        if self.all_columns:
+            names = [name for name, field in self.schema.model_fields.items() if schema_of(field.annotation) is None]
+        return [name for name in names if name in mapped]
+
+
+class Projection:
+    def __init__(self, model, schema, keys, fields, include):
+        self.root = _Node(model, schema, not fields)
+        for path in fields:
+            *parents, last = path.split(".")
+            node = self.root
+            for i, name in enumerate(parents):
+                node = node.child(name, ".".join(parents[:i + 1]))
+            field = node.schema.model_fields.get(last)
+            if field is not None and schema_of(field.annotation) is not None:
+                node.child(last, path).all_columns = True
+            elif field is not None and last in inspect(node.model).columns:
+                if last not in node.columns:
+                    node.columns.append(last)
+            else:
+                raise HTTPException(status_code=400, detail=f"Unknown field '{path}'")
+        for path in include:
+            node = self.root
+            names = path.split(".")
+            for i, name in enumerate(names):
+                node = node.child(name, ".".join(names[:i + 1]))
+                node.all_columns = True
+
+        self._columns = []
+        self._joins = []
+        self._shape = self._compile(self.root, model, "")
+        # Keyset columns must be in the row for next_cursor(); they are
+        # selected under their own name and left out of the output if unasked
+        selected = {column.key for column in self._columns}
+        for key in map(key_column, keys):
+            if key.key not in selected:
+                self._columns.append(key.label(key.key))
+        self.statement = select(*self._columns).select_from(model)
+        for alias, onclause in self._joins:
+            self.statement = self.statement.outerjoin(alias, onclause)
+
+    def _compile(self, node, entity, prefix):
+        fields = []
+        for name in node.column_names():
+            fields.append((name, len(self._columns)))
+            self._columns.append(getattr(entity, name).label(prefix + name))
+        marker = None
+        if prefix:
+            # An outer join that found nothing renders as null, not as {}
+            pk = inspect(node.model).primary_key[0].key
+            marker = len(self._columns)
+            self._columns.append(getattr(entity, pk).label(prefix + "_pk"))
+        children = []
+        for name, child in node.children.items():
+            alias = aliased(child.model)
+            self._joins.append((alias, getattr(entity, name).of_type(alias)))
+            children.append((name, self._compile(child, alias, f"{prefix}{name}__")))
+        return fields, marker, children
+
+    def _build(self, shape, row):
+        fields, marker, children = shape
+        if marker is not None and row[marker] is None:
+            return None
+        item = {name: row[index] for name, index in fields}
+        for name, child in children:
+            item[name] = self._build(child, row)
+        return item
+
+    def render(self, rows):
+        return [self._build(self._shape, row) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def _projection(model, schema, keys, fields, include):
+    return Projection(model, schema, keys, fields, include)
+
+
+def projection(model, schema, keys, fields, include):
+    """The compiled Projection for ?fields= / ?include= (400 on unknown names)"""
+    return _projection(model, schema, tuple(keys), _split(fields), _split(include))
+
+
+def _page_response(plan, rows, keys, limit):
+    cursor = next_cursor(rows, keys, limit)
+    return ORJSONResponse(plan.render(rows), headers={NEXT_CURSOR_HEADER: cursor} if cursor else None)
+
+
+def projected_page(db, model, schema, keys, fields, include, skip, limit, cursor, filters=()):
+    """One page of `model` as sparse dicts, for a sync Session"""
+    plan = projection(model, schema, keys, fields, include)
+    rows = db.execute(paginate(plan.statement.where(*filters), keys, skip, limit, cursor)).all()
+    return _page_response(plan, rows, keys, limit)
+
+
+async def projected_page_async(db, model, schema, keys, fields, include, skip, limit, cursor):
+    """One page of `model` as sparse dicts, for an AsyncSession"""
+    plan = projection(model, schema, keys, fields, include)
+    rows = (await db.execute(paginate(plan.statement, keys, skip, limit, cursor))).all()
+    return _page_response(plan, rows, keys, limit)
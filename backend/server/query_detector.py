@@ -0,0 +1,138 @@
+"""
+N+1 and slow-query detector for development and staging (QUERY_DETECTOR).
+
+Every SELECT a request issues is reduced to its shape: placeholders and
+literals become ?, and IN lists collapse to one element, so the lazy load of
+customer 7 and of customer 8 look the same. When one shape runs more than
+QUERY_REPEAT_THRESHOLD times in a request, the detector logs it (warn) or
+raises QueryPatternError out of the request (raise, for test runs). Any
+statement slower than SLOW_QUERY_MS is logged with its route. Both reports
+carry a stack excerpt of the application frames that issued the statement.
+"""
+
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger("barberian.queries")
+
+MODES = ("off", "warn", "raise")
+STACK_FRAMES = 6
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+_current = ContextVar("query_detector", default=None)
+
+
+class QueryPatternError(RuntimeError):
+    pass
+
+
+def normalize(statement):
+    """The shape of a statement: same text for every parameter value"""
+    shape = _PLACEHOLDERS.sub("?", statement)
+    shape = _LITERALS.sub("?", shape)
+    shape = _LISTS.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+def stack_excerpt():
+    """The innermost application frames (this package, outside this module)"""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_DIR) and not frame.filename.endswith(("query_detector.py", "request_metrics.py"))
+    ]
+    return "".join(traceback.format_list(frames[-STACK_FRAMES:])).rstrip()
+
+
+class RequestQueries:
+    __slots__ = ("scope", "shapes", "stacks")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.shapes = Counter()
+        self.stacks = {}
+
+    def route_name(self):
+        # The router has stored the matched route in the scope by the time SQL runs
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', self.scope['path'])}"
+
+
+class QueryDetector:
+    def __init__(self, mode="warn", repeat_threshold=5, slow_query_ms=200):
+        if mode not in MODES:
+            raise ValueError(f"QUERY_DETECTOR must be one of {', '.join(MODES)}")
+        self.mode = mode
+        self.repeat_threshold = repeat_threshold
+        self.slow_query_ms = slow_query_ms
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_detector_started", []).append(time.perf_counter())
+
+    def _error(self, exception_context):
+        # A failed statement skips _after: drop its start time from the connection
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_detector_started"):
+            conn.info["query_detector_started"].pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_detector_started"].pop()) * 1000
+        request = _current.get()
+        if elapsed_ms > self.slow_query_ms:
+            logger.warning(
+                "Slow query (%.0f ms > %s ms) in %s: %s\n%s", elapsed_ms, self.slow_query_ms,
+                request.route_name() if request is not None else "-", _SPACES.sub(" ", statement)[:500], stack_excerpt(),
+            )
+        if request is None or statement.lstrip()[:6].upper() != "SELECT":
+            return
+        shape = normalize(statement)
+        request.shapes[shape] += 1
+        # One stack per offending shape, taken when it first crosses the threshold
+        if request.shapes[shape] == self.repeat_threshold + 1:
+            request.stacks[shape] = stack_excerpt()
+
+    def report(self, request):
+        repeated = [(shape, count) for shape, count in request.shapes.items() if count > self.repeat_threshold]
+        if not repeated:
+            return
+        message = "\n".join(
+            f"Possible N+1 in {request.route_name()}: {count} x {shape[:300]}\n{request.stacks.get(shape, '')}"
+            for shape, count in repeated
+        )
+        if self.mode == "raise":
+            raise QueryPatternError(message)
+        logger.warning(message)
+
+
+class QueryDetectorMiddleware:
+    def __init__(self, app, detector):
+        self.app = app
+        self.detector = detector
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestQueries(scope)
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+        self.detector.report(request)
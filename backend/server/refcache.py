@@ -0,0 +1,120 @@
+"""
+In-process cache for reference data (roles, genres, cities, ...).
+
+Responses are kept as pre-serialized JSON with a content ETag, bounded by
+entry count (LRU) and age (TTL). Keys are tuples whose first element is a
+namespace; create_* endpoints invalidate their namespace after committing.
+Each worker process has its own cache, so a write seen by one worker reaches
+the others at the latest when their entries expire.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List
+
+from fastapi import Response, status
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema):
+    return TypeAdapter(List[schema])
+
+
+def serialize(schema, rows):
+    """JSON bytes for a list of ORM rows, as response_model=List[schema] would render them"""
+    adapter = _list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "headers", "expires")
+
+    def __init__(self, body, headers, expires):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.headers = headers
+        self.expires = expires
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ReferenceCache:
+    def __init__(self, maxsize=256, ttl=300, max_age=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Browsers may reuse a response for max_age seconds; 0 makes them
+        # revalidate every time, which costs a 304 with no body
+        self.cache_control = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def put(self, key, body, headers, generation):
+        """Store an entry unless its namespace was invalidated while it was being loaded"""
+        entry = CachedResponse(body, headers, time.monotonic() + self.ttl)
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation or self.maxsize <= 0:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            for namespace in {key[0] for key in self._entries}:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses}
+
+    def respond(self, request, key, schema, load):
+        """
+        Serve `key` from the cache, calling load() -> (rows, headers) on a miss.
+        Answers 304 when the client already holds the current ETag.
+        """
+        entry = self.get(key)
+        if entry is None:
+            generation = self.generation(key[0])
+            rows, headers = load()
+            entry = self.put(key, serialize(schema, rows), headers, generation)
+        headers = {"ETag": entry.etag, "Cache-Control": self.cache_control, **entry.headers}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,176 @@
+"""
+Read/write splitting between the primary and read replicas (REPLICA_URLS).
+
+get_db binds the reads of a GET/HEAD request to a replica picked by
+ReplicaSet.choose(), round-robin or by fewest checked-out connections.
+RoutingSession still sends flushes and INSERT/UPDATE/DELETE to the primary.
+Every other request uses the primary, and so do a client's reads for
+READ_YOUR_WRITES_SECONDS after one of its writes succeeded:
+ReadYourWritesMiddleware marks the client with a cookie.
+
+Lag is measured with a heartbeat row. Every REPLICA_CHECK_SECONDS the monitor
+writes the time to replica_heartbeat on the primary, then reads each
+replica's copy. The result includes up to one check interval. A replica
+further behind than REPLICA_MAX_LAG, or one that fails the check, gets no
+reads until it catches up; with none left, reads fall back to the primary.
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.requests import cookie_parser
+
+logger = logging.getLogger("barberian.replicas")
+
+SELECTIONS = ("round-robin", "least-connections")
+READ_METHODS = ("GET", "HEAD")
+PRIMARY_COOKIE = "read_primary_until"
+
+# Outside a request (scripts, background tasks) everything reads the primary
+_prefer_primary = ContextVar("prefer_primary", default=True)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def _checked_out(engine):
+    checkedout = getattr(engine.pool, "checkedout", None)
+    return checkedout() if checkedout is not None else 0
+
+
+class RoutingSession(Session):
+    """Reads go to info["replica"] when get_db set one; flushes and DML always go to the session's bind (the primary)"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return replica
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class Replica:
+    __slots__ = ("name", "engine", "async_engine", "lag", "error")
+
+    def __init__(self, name, engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.lag = None
+        self.error = "not checked yet"
+
+
+class ReplicaSet:
+    def __init__(self, replicas, heartbeat, selection="round-robin", max_lag=5.0, check_seconds=1.0):
+        if selection not in SELECTIONS:
+            raise ValueError(f"REPLICA_SELECTION must be one of {', '.join(SELECTIONS)}")
+        self.replicas = replicas
+        self.heartbeat = heartbeat
+        self.selection = selection
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        # Replicas fit to serve reads; replaced as a whole by check()
+        self.available = []
+        self._turn = itertools.count()
+
+    def engines(self):
+        return [replica.engine for replica in self.replicas]
+
+    def async_engines(self):
+        return [replica.async_engine for replica in self.replicas if replica.async_engine is not None]
+
+    def choose(self, use_async=False):
+        """The replica the current request reads from, or None for the primary"""
+        candidates = self.available
+        if not candidates or _prefer_primary.get():
+            return None
+        if self.selection == "round-robin":
+            return candidates[next(self._turn) % len(candidates)]
+        return min(candidates, key=lambda replica: _checked_out(
+            replica.async_engine.sync_engine if use_async else replica.engine))
+
+    def beat(self, primary):
+        heartbeat = self.heartbeat
+        with primary.begin() as connection:
+            beat_ms = now_ms()
+            if not connection.execute(update(heartbeat).where(heartbeat.c.id == 1).values(beat_ms=beat_ms)).rowcount:
+                connection.execute(insert(heartbeat).values(id=1, beat_ms=beat_ms))
+
+    def check(self, primary):
+        """Write a heartbeat on the primary and measure every replica against the previous one"""
+        available = []
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    beat_ms = connection.execute(select(self.heartbeat.c.beat_ms).where(self.heartbeat.c.id == 1)).scalar()
+            except Exception as exc:
+                replica.lag, replica.error = None, f"{type(exc).__name__}: {exc}"
+            else:
+                replica.lag = None if beat_ms is None else max(now_ms() - beat_ms, 0) / 1000
+                replica.error = "no heartbeat yet" if beat_ms is None else None
+            if replica.error is None and replica.lag <= self.max_lag:
+                available.append(replica)
+        if len(available) != len(self.available):
+            logger.warning("%d of %d replicas serving reads: %s", len(available), len(self.replicas),
+                           ", ".join(f"{replica.name}={replica.error or f'{replica.lag:.1f}s'}" for replica in self.replicas))
+        self.available = available
+        self.beat(primary)
+
+    async def monitor(self, primary):
+        while True:
+            try:
+                await asyncio.to_thread(self.check, primary)
+            except Exception:
+                logger.exception("Replica check failed")
+            await asyncio.sleep(self.check_seconds)
+
+    def status(self):
+        return [
+            {"name": replica.name, "serving": replica in self.available, "lag_seconds": replica.lag,
+             "error": replica.error, "checked_out": _checked_out(replica.engine)}
+            for replica in self.replicas
+        ]
+
+
+class ReadYourWritesMiddleware:
+    """Routes GET/HEAD reads to replicas unless the client wrote within `window` seconds"""
+
+    def __init__(self, app, window):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflights neither read nor write
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] in READ_METHODS:
+            token = _prefer_primary.set(self._wrote_recently(scope))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _prefer_primary.reset(token)
+            return
+
+        async def marking_send(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and self.window > 0:
+                cookie = (f"{PRIMARY_COOKIE}={now_ms() + int(self.window * 1000)}; "
+                          f"Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, marking_send)
+
+    def _wrote_recently(self, scope):
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                until = cookie_parser(value.decode("latin-1")).get(PRIMARY_COOKIE, "")
+                return until.isdigit() and int(until) > now_ms()
+        return False
@@ -0,0 +1,201 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+MetricsMiddleware times every request and measures the response size; the
+cursor-execute hooks count the SQL statements a request issues and the time
+spent in them. The per-request tally lives in a ContextVar, which Starlette
+copies into the threadpool and SQLAlchemy into its async greenlets, so the
+hooks always find the request they belong to. Aggregates are keyed by
+(method, route template) and only ever written from the middleware on the
+event loop thread, so they need no lock; /metrics renders them on that
+thread as well.
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from pool_metrics import pool_stats
+from warmup import WARMUP_SCOPE_KEY
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+PREFIX = "barberian"
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestTally:
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+def current_tally():
+    """The tally of the request being served, or None outside a request"""
+    return _current.get()
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "statements", "sql_seconds", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.sql_seconds = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes = {}
+
+    def observe(self, method, route, status, seconds, tally, size):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.latency.observe(seconds)
+        metrics.statements.observe(tally.statements)
+        metrics.sql_seconds.observe(tally.sql_seconds)
+        metrics.response_bytes.observe(size)
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def render(self):
+        lines = []
+        routes = sorted(self.routes.items())
+        lines += _header("http_requests_total", "counter", "Requests by route and status")
+        for (method, route), metrics in routes:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(_sample("http_requests_total", {"method": method, "route": route, "status": status}, count))
+        for name, attribute, help_text in (
+            ("http_request_duration_seconds", "latency", "Request latency by route"),
+            ("http_request_sql_statements", "statements", "SQL statements issued per request"),
+            ("http_request_sql_duration_seconds", "sql_seconds", "Time spent executing SQL per request"),
+            ("http_response_size_bytes", "response_bytes", "Response body size"),
+        ):
+            lines += _header(name, "histogram", help_text)
+            for (method, route), metrics in routes:
+                lines += _histogram(name, {"method": method, "route": route}, getattr(metrics, attribute))
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+    return f"{PREFIX}_{name}{{{rendered}}} {value}" if rendered else f"{PREFIX}_{name} {value}"
+
+
+def _header(name, kind, help_text):
+    return [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} {kind}"]
+
+
+def _histogram(name, labels, histogram):
+    lines, total = [], 0
+    for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+        total += count
+        lines.append(_sample(f"{name}_bucket", {**labels, "le": bound}, total))
+    lines.append(_sample(f"{name}_sum", labels, round(histogram.sum, 6)))
+    lines.append(_sample(f"{name}_count", labels, total))
+    return lines
+
+
+def render_pools(engines):
+    """Pool gauges and counters for {label: engine}, from pool_stats()"""
+    gauges = {"size": "Configured pool size", "checked_out": "Connections in use",
+              "idle": "Idle pooled connections", "overflow": "Connections open above the pool size"}
+    counters = {"checkouts": "Connection checkouts", "timeouts": "Checkouts that timed out",
+                "invalidations": "Connections invalidated"}
+    stats = {label: pool_stats(engine) for label, engine in engines.items() if engine is not None}
+    lines = []
+    for kind, metrics in (("gauge", gauges), ("counter", counters)):
+        for key, help_text in metrics.items():
+            name = f"db_pool_{key}" + ("_total" if kind == "counter" else "")
+            samples = [_sample(name, {"engine": label}, values[key]) for label, values in stats.items() if key in values]
+            if samples:
+                lines += _header(name, kind, help_text) + samples
+    return lines
+
+
+def attach_sql_hooks(engine):
+    """Count statements and SQL time of the current request on `engine`"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("request_metrics_started", []).append(time.perf_counter())
+
+    def finish(conn):
+        started = conn.info["request_metrics_started"].pop()
+        tally = _current.get()
+        if tally is not None:
+            tally.statements += 1
+            tally.sql_seconds += time.perf_counter() - started
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        finish(conn)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute; without this its
+        # start time would stay on the connection and skew every later timing
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("request_metrics_started"):
+            finish(conn)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are measured to the last byte"""
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        # Startup warmup requests would show up as the slowest of every route
+        if scope["type"] != "http" or scope.get(WARMUP_SCOPE_KEY):
+            await self.app(scope, receive, send)
+            return
+        tally = RequestTally()
+        token = _current.set(tally)
+        started = time.perf_counter()
+        response = {"status": 500, "size": 0}
+
+        async def measuring_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, measuring_send)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope; unmatched
+            # paths share one label so scanners can't blow up cardinality
+            route = scope.get("route")
+            self.registry.observe(scope["method"], getattr(route, "path", "unmatched"), response["status"],
+                                  time.perf_counter() - started, tally, response["size"])
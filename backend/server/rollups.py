@@ -0,0 +1,195 @@
+"""
+Per-barber daily occupancy rollup for the dashboard endpoints.
+Rebuild: python rollups.py   (uses DATABASE_URL, see settings.py)
+
+One row per (id_barber, appointment_date) holds how many of that day's
+appointments are in each status. Every ORM flush that adds, deletes or
+changes an appointment (its status, barber or date) applies the resulting
++1/-1 deltas in the same transaction, one upsert per affected row; bulk
+inserts go through add_rows(). The dashboards read only this table, so a
+date range costs one row per barber and day however many appointments it
+holds. rebuild() recomputes it from the appointment table, which also
+repairs any drift left by writes that bypassed the ORM.
+
+The table is created by migration 5. Without it no deltas are written, the
+dashboards aggregate the appointment table instead and the slot watcher
+sees no changes; run rebuild() (the migration does) once it exists.
+"""
+
+from collections import Counter, defaultdict
+from enum import Enum
+
+from sqlalchemy import and_, case, delete, event, func, inspect, or_, select, tuple_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import TablePresence
+
+UPSERTS = {"mysql": mysql_insert, "postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def _status_name(value, default):
+    if value is None:
+        return default
+    return value.value if isinstance(value, Enum) else value
+
+
+class OccupancyRollup:
+    def __init__(self, rollup_model, appointment_model, statuses, default_status):
+        # statuses: the status values, which are also the rollup's column names
+        self.table = rollup_model.__table__
+        self.appointment = appointment_model
+        self.statuses = statuses
+        self.default_status = default_status
+        self.present = TablePresence(self.table, migration=5)
+
+    def install(self, session_class):
+        """Keep the rollup in step with every ORM flush on `session_class`"""
+        event.listen(session_class, "after_flush", self._after_flush)
+
+    def _key(self, obj, committed):
+        # In after_flush the attribute history still describes this flush
+        values = []
+        for name in ("id_barber", "appointment_date", "status"):
+            history = inspect(obj).attrs[name].history
+            if committed:
+                value = (history.deleted or history.unchanged or history.added or [None])[0]
+            else:
+                value = (history.added or history.unchanged or [None])[0]
+            values.append(value)
+        barber, day, status = values
+        return barber, day, _status_name(status, self.default_status)
+
+    def _after_flush(self, session, flush_context):
+        deltas = Counter()
+        for obj in session.new:
+            if isinstance(obj, self.appointment):
+                deltas[self._key(obj, committed=False)] += 1
+        for obj in session.deleted:
+            if isinstance(obj, self.appointment):
+                deltas[self._key(obj, committed=True)] -= 1
+        for obj in session.dirty:
+            if isinstance(obj, self.appointment) and obj not in session.deleted:
+                before, after = self._key(obj, committed=True), self._key(obj, committed=False)
+                if before != after:
+                    deltas[before] -= 1
+                    deltas[after] += 1
+        if any(deltas.values()):
+            self.apply(session.connection(), deltas)
+
+    def add_rows(self, connection, model, rows):
+        """Count bulk-inserted appointment rows (dicts); no-op for other models"""
+        if model is not self.appointment:
+            return
+        deltas = Counter(
+            (row["id_barber"], row["appointment_date"], _status_name(row.get("status"), self.default_status))
+            for row in rows
+        )
+        if deltas:
+            self.apply(connection, deltas)
+
+    def apply(self, connection, deltas):
+        """Add {(id_barber, appointment_date, status): delta} in the caller's transaction"""
+        if not self.present(connection):
+            return
+        by_day = defaultdict(dict)
+        for (barber, day, status), delta in deltas.items():
+            if delta:
+                by_day[(barber, day)][status] = by_day[(barber, day)].get(status, 0) + delta
+        # Same row order in every transaction, so two writers cannot deadlock
+        for (barber, day), changes in sorted(by_day.items()):
+            self._upsert(connection, barber, day, changes)
+
+    def _upsert(self, connection, barber, day, changes):
+        table = self.table
+        increments = {status: table.c[status] + delta for status, delta in changes.items()}
+        insert = UPSERTS.get(connection.dialect.name)
+        if insert is None:
+            # No portable upsert: update, and insert if there was no row yet
+            updated = connection.execute(
+                update(table).where(table.c.id_barber == barber, table.c.appointment_date == day).values(increments))
+            if not updated.rowcount:
+                connection.execute(table.insert().values(id_barber=barber, appointment_date=day, **changes))
+            return
+        statement = insert(table).values(id_barber=barber, appointment_date=day, **changes)
+        if connection.dialect.name == "mysql":
+            statement = statement.on_duplicate_key_update(increments)
+        else:
+            statement = statement.on_conflict_do_update(index_elements=[table.c.id_barber, table.c.appointment_date],
+                                                        set_=increments)
+        connection.execute(statement)
+
+    def _status_counts(self):
+        # SUM(CASE ...) per status over the appointment table, labelled like the rollup's columns
+        appointment = self.appointment
+        counts = []
+        for status in self.statuses:
+            matches = appointment.status == status
+            if status == self.default_status:
+                matches = or_(matches, appointment.status.is_(None))
+            counts.append(func.sum(case((matches, 1), else_=0)).label(status))
+        return counts
+
+    def rebuild(self, connection):
+        """Recompute every row from the appointments; returns the number of rows"""
+        appointment = self.appointment
+        source = (
+            select(appointment.id_barber, appointment.appointment_date, *self._status_counts())
+            .group_by(appointment.id_barber, appointment.appointment_date)
+        )
+        self.present.mark_present(connection)
+        connection.execute(delete(self.table))
+        connection.execute(self.table.insert().from_select(["id_barber", "appointment_date", *self.statuses], source))
+        return connection.execute(select(func.count()).select_from(self.table)).scalar()
+
+    def counts(self, engine, keys):
+        """{(id_barber, appointment_date): status counts} for the given days that have a row"""
+        table = self.table
+        columns = [table.c[status] for status in self.statuses]
+        found = {}
+        with engine.connect() as connection:
+            if not self.present(connection):
+                return found
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = connection.execute(
+                    select(table.c.id_barber, table.c.appointment_date, *columns)
+                    .where(tuple_(table.c.id_barber, table.c.appointment_date).in_(batch))
+                )
+                for row in rows:
+                    found[(row[0], row[1])] = tuple(row[2:])
+        return found
+
+    def days(self, connection, date_from, date_to, barbers=None):
+        """Per-day status counts between the dates (inclusive), summed over `barbers`:
+        a barber id, a SELECT of barber ids, or None for all barbers"""
+        if self.present(connection):
+            source = self.table.c
+            counts = [func.sum(source[status]).label(status) for status in self.statuses]
+        else:
+            # No rollup table yet: the same sums straight from the appointments
+            source = self.appointment.__table__.c
+            counts = self._status_counts()
+        statement = (
+            select(source.appointment_date, *counts)
+            .where(and_(source.appointment_date >= date_from, source.appointment_date <= date_to))
+            .group_by(source.appointment_date)
+            .order_by(source.appointment_date)
+        )
+        if isinstance(barbers, int):
+            statement = statement.where(source.id_barber == barbers)
+        elif barbers is not None:
+            statement = statement.where(source.id_barber.in_(barbers))
+        return [
+            {"appointment_date": row.appointment_date, **{status: int(getattr(row, status)) for status in self.statuses}}
+            for row in connection.execute(statement)
+        ]
+
+
+if __name__ == "__main__":
+    import main
+
+    main.configure_database(main.settings)
+    with main.engine.begin() as connection:
+        print(f"Rebuilt appointment_rollups: {main.occupancy_rollup.rebuild(connection)} rows")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Production launcher: WEB_CONCURRENCY uvicorn worker processes serving main.create_app()
+Run: python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+
+Workers are fresh interpreters (uvicorn spawns them) that share the listening
+socket; each calls the main:create_app factory, which builds its own engines,
+pools and caches from the environment.
+Their pools are sized so that all workers together open at most
+DB_MAX_CONNECTIONS (see database.pool_budget), and the launcher checks that
+budget before starting any of them. On SIGTERM/SIGINT every worker stops
+accepting connections, lets in-flight requests finish for up to
+GRACEFUL_TIMEOUT seconds, then runs the lifespan shutdown, which closes its
+pooled connections.
+
+Under a pre-forking server (gunicorn --preload), database.py disposes the
+inherited pools in each child, so no connection is shared across processes.
+"""
+
+import argparse
+import os
+from dataclasses import replace
+
+import uvicorn
+
+from database import pool_budget
+from settings import Settings
+
+
+def main():
+    settings = Settings.from_env()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=settings.workers, help="worker processes (default: WEB_CONCURRENCY, or 1)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.graceful_timeout,
+                        help="seconds to let in-flight requests finish on shutdown (default: GRACEFUL_TIMEOUT)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Workers read their settings from the environment; the worker count
+    # decides their share of DB_MAX_CONNECTIONS
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    pool_size, max_overflow = pool_budget(replace(settings, workers=args.workers))
+    print(f"Starting {args.workers} worker(s), pool_size={pool_size} max_overflow={max_overflow} per engine")
+    uvicorn.run(
+        "main:create_app", factory=True, host=args.host, port=args.port, workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout, log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Server-Sent Events for a barber's day: a client subscribes to one
+(id_barber, appointment_date) and is pushed what changes, instead of polling
+the barber's whole appointment list.
+
+The stream opens with a `snapshot` event (that day's non-cancelled
+appointments), then sends a `change` event with just the appointments that
+were created or changed, and a comment line every SLOT_STREAM_KEEPALIVE
+seconds so idle connections survive proxies. An idle subscriber is one
+queue waiting on the event loop: no thread, no pooled connection.
+
+SlotHub fans events out in-process. ORM writes are captured by session
+events and published once their transaction commits; Core writes call
+publish_rows() after their commit. Each event is encoded once and shared by
+every subscriber of its day. A subscriber whose queue overflows is sent a
+fresh snapshot instead of the backlog. Other workers' writes never reach
+this hub, so with several workers watch() polls the occupancy rollup of the
+subscribed days and re-sends a snapshot of any day whose counts moved.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from enum import Enum
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+
+logger = logging.getLogger("barberian.slots")
+
+SLOT_FIELDS = ("id_appointment", "start_time", "end_time", "status")
+
+
+def _value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def slot(row):
+    """The client-facing fields of an appointment (mapping, row or ORM object)"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    return {name: _value(get(name)) for name in SLOT_FIELDS}
+
+
+def format_event(name, data):
+    return b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscription:
+    __slots__ = ("key", "queue", "resync")
+
+    def __init__(self, key, size):
+        self.key = key
+        self.queue = asyncio.Queue(size)
+        self.resync = False
+
+
+class SlotHub:
+    def __init__(self, queue_size=64, keepalive=15):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.subscribers = defaultdict(set)
+        self.loop = None
+        self._loop_thread = None
+        self.published = 0
+
+    def configure(self, queue_size, keepalive):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+
+    def bind(self, loop):
+        """Deliver on `loop` (the app's event loop, set by the lifespan)"""
+        self.loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def install(self, session_class, appointment_model):
+        """Publish the appointments of every committed ORM flush on `session_class`"""
+
+        def after_flush(session, flush_context):
+            changes = []
+            for obj in (*session.new, *session.dirty, *session.deleted):
+                if isinstance(obj, appointment_model):
+                    change = {"id_barber": obj.id_barber, "appointment_date": obj.appointment_date, **slot(obj)}
+                    if obj in session.deleted:
+                        change["status"] = "deleted"
+                    changes.append(change)
+            if changes:
+                session.info.setdefault("slot_changes", []).extend(changes)
+
+        def after_commit(session):
+            changes = session.info.pop("slot_changes", None)
+            if changes:
+                self.publish_rows(changes)
+
+        def after_rollback(session):
+            session.info.pop("slot_changes", None)
+
+        event.listen(session_class, "after_flush", after_flush)
+        event.listen(session_class, "after_commit", after_commit)
+        event.listen(session_class, "after_soft_rollback", lambda session, previous: after_rollback(session))
+
+    def subscribe(self, key):
+        subscription = Subscription(key, self.queue_size)
+        self.subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self.subscribers.get(subscription.key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.key]
+
+    def publish_rows(self, rows):
+        """Publish committed appointments (mappings with id_barber, appointment_date and
+        the slot fields); safe to call from any thread"""
+        if self.loop is None:
+            return
+        by_day = defaultdict(list)
+        for row in rows:
+            by_day[(row["id_barber"], row["appointment_date"])].append(slot(row))
+        if threading.get_ident() == self._loop_thread:
+            self._deliver(by_day)
+        else:
+            self.loop.call_soon_threadsafe(self._deliver, by_day)
+
+    def _deliver(self, by_day):
+        for (barber, day), appointments in by_day.items():
+            subscribers = self.subscribers.get((barber, day))
+            if not subscribers:
+                continue
+            message = format_event("change", {"id_barber": barber, "appointment_date": day, "appointments": appointments})
+            self.published += 1
+            for subscription in subscribers:
+                self._put(subscription, message)
+
+    def _put(self, subscription, message):
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind to catch up with diffs: drop them, send a snapshot
+            subscription.resync = True
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+
+    def resync(self, key):
+        for subscription in self.subscribers.get(key, ()):
+            subscription.resync = True
+            self._put(subscription, None)
+
+    async def stream(self, key, load_snapshot):
+        """The SSE body for one subscriber; load_snapshot() is a blocking loader of the day"""
+        # Subscribe first: a change committed while the snapshot loads is
+        # sent again afterwards rather than lost
+        subscription = self.subscribe(key)
+        barber, day = key
+        try:
+            while True:
+                subscription.resync = False
+                appointments = await run_in_threadpool(load_snapshot)
+                yield format_event("snapshot", {"id_barber": barber, "appointment_date": day, "appointments": appointments})
+                while not subscription.resync:
+                    try:
+                        message = await asyncio.wait_for(subscription.queue.get(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        yield b": keepalive\n\n"
+                        continue
+                    if message is not None and not subscription.resync:
+                        yield message
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+        finally:
+            self.unsubscribe(subscription)
+
+    async def watch(self, engine, rollup, interval):
+        """Re-send a snapshot of each subscribed day whose rollup counts changed
+        (writes made by other workers); runs until cancelled"""
+        seen = {}
+        while True:
+            await asyncio.sleep(interval)
+            keys = list(self.subscribers)
+            if not keys:
+                seen.clear()
+                continue
+            try:
+                counts = await asyncio.to_thread(rollup.counts, engine, keys)
+            except Exception:
+                logger.exception("Slot watch failed")
+                continue
+            for key in keys:
+                current = counts.get(key)
+                if key in seen and seen[key] != current:
+                    self.resync(key)
+                seen[key] = current
+            for key in set(seen) - set(keys):
+                del seen[key]
+
+    def stats(self):
+        return {
+            "days": len(self.subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self.subscribers.values()),
+            "published": self.published,
+        }
@@ -0,0 +1,219 @@
+"""
+Background sweeper that cancels stale pending appointments.
+
+An appointment still pending PENDING_EXPIRY_HOURS after its end time was
+never confirmed and never will be; every SWEEPER_INTERVAL seconds the
+sweeper cancels those. The appointment table has no creation time, so the
+age is measured from the slot itself.
+
+A pass walks the primary key in ranges of SWEEPER_CHUNK ids. Each range is
+one short transaction: lock and read the range's pending rows, cancel the
+expired ones with one UPDATE and adjust the occupancy rollup, commit. No
+transaction touches more than one range, so bookings never wait on the
+sweeper for long, and SWEEPER_PAUSE seconds between ranges leave room for
+them. With several workers only the holder of the "sweeper" row in
+job_leases sweeps; the lease is renewed before every range and expires on
+its own when its holder dies.
+
+A pass starts at the watermark: the lowest id that was still pending after
+the previous pass (or one past the highest id). Appointments never return to
+pending and new ones get higher ids, so nothing below it can become stale,
+and a pass only reads the recent part of the table. The watermark lives in
+the sweeping process; a new lease holder starts with one full pass. The
+reported lag is how long the oldest expired appointment still pending has
+been expired, 0 when the sweeper has caught up.
+
+Each range's cancelled appointments are handed to `publish` after the
+commit (the slot stream hub), so open streams see them like any other
+status change.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger("barberian.sweeper")
+
+LEASE_NAME = "sweeper"
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class PendingSweeper:
+    def __init__(self, appointment_model, lease_model, rollup, pending, cancelled,
+                 expiry_hours=24, interval=300, chunk=500, pause=0.05, publish=None):
+        self.appointment = appointment_model.__table__
+        self.leases = lease_model.__table__
+        self.rollup = rollup
+        self.pending = pending
+        self.cancelled = cancelled
+        self.expiry = timedelta(hours=expiry_hours)
+        self.interval = interval
+        self.chunk = chunk
+        self.pause = pause
+        self.publish = publish
+        # Outlives a pass comfortably, so a live holder never loses the lease
+        self.lease_seconds = max(interval * 2, 60)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leader = False
+        self.passes = 0
+        self.cancelled_total = 0
+        self.last_pass = None
+        self.last_error = None
+        self.watermark = 0
+
+    def hold_lease(self, engine):
+        """Take or renew the lease; False while another process holds it"""
+        leases = self.leases
+        expires = now_ms() + int(self.lease_seconds * 1000)
+        with engine.begin() as connection:
+            renewed = connection.execute(
+                update(leases)
+                .where(leases.c.name == LEASE_NAME, or_(leases.c.owner == self.owner, leases.c.expires_ms < now_ms()))
+                .values(owner=self.owner, expires_ms=expires)
+            ).rowcount
+            if renewed:
+                return True
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(leases).values(name=LEASE_NAME, owner=self.owner, expires_ms=expires))
+            return True
+        except IntegrityError:
+            # The lease row exists and is held by a live process
+            return False
+
+    def _expired(self, cutoff):
+        appointment = self.appointment
+        return and_(
+            appointment.c.status == self.pending,
+            or_(appointment.c.appointment_date < cutoff.date(),
+                and_(appointment.c.appointment_date == cutoff.date(), appointment.c.end_time <= cutoff.time())),
+        )
+
+    def sweep_range(self, engine, low, high, cutoff):
+        """Cancel the expired pending appointments with low <= id < high; returns
+        how many, and the lowest id left pending (None if there is none)"""
+        appointment = self.appointment
+        with engine.begin() as connection:
+            pending = connection.execute(
+                select(appointment.c.id_appointment, appointment.c.id_barber, appointment.c.appointment_date,
+                       appointment.c.start_time, appointment.c.end_time)
+                .where(appointment.c.id_appointment >= low, appointment.c.id_appointment < high,
+                       appointment.c.status == self.pending)
+                .order_by(appointment.c.id_appointment)
+                .with_for_update()
+            ).all()
+            expired = [datetime.combine(row.appointment_date, row.end_time) <= cutoff for row in pending]
+            rows = [row for row, stale in zip(pending, expired) if stale]
+            left = next((row.id_appointment for row, stale in zip(pending, expired) if not stale), None)
+            if not rows:
+                return 0, left
+            connection.execute(
+                update(appointment)
+                .where(appointment.c.id_appointment.in_([row.id_appointment for row in rows]),
+                       appointment.c.status == self.pending)
+                .values(status=self.cancelled)
+            )
+            deltas = {}
+            for row in rows:
+                for status, delta in ((self.pending.value, -1), (self.cancelled.value, 1)):
+                    key = (row.id_barber, row.appointment_date, status)
+                    deltas[key] = deltas.get(key, 0) + delta
+            self.rollup.apply(connection, deltas)
+        if self.publish is not None:
+            self.publish([{**row._asdict(), "status": self.cancelled} for row in rows])
+        return len(rows), left
+
+    def id_bounds(self, engine):
+        appointment = self.appointment
+        with engine.connect() as connection:
+            return connection.execute(
+                select(func.min(appointment.c.id_appointment), func.max(appointment.c.id_appointment))
+            ).one()
+
+    async def sweep(self, engine):
+        """One pass from the watermark; None when another process holds the lease"""
+        self.leader = await asyncio.to_thread(self.hold_lease, engine)
+        if not self.leader:
+            return None
+        started = time.monotonic()
+        cutoff = datetime.now() - self.expiry
+        low, high = await asyncio.to_thread(self.id_bounds, engine)
+        cancelled = ranges = 0
+        if low is not None:
+            first = max(low, self.watermark)
+            # The next watermark: the first id left pending, else where the pass stopped
+            left = None
+            reached = first
+            for start in range(first, high + 1, self.chunk):
+                if ranges and not await asyncio.to_thread(self.hold_lease, engine):
+                    self.leader = False
+                    break
+                count, range_left = await asyncio.to_thread(self.sweep_range, engine, start, start + self.chunk, cutoff)
+                cancelled += count
+                left = left if left is not None else range_left
+                reached = min(start + self.chunk, high + 1)
+                ranges += 1
+                await asyncio.sleep(self.pause)
+            self.watermark = left if left is not None else reached
+        self.passes += 1
+        self.cancelled_total += cancelled
+        self.last_pass = {"finished_ms": now_ms(), "seconds": round(time.monotonic() - started, 3),
+                          "cutoff": cutoff.isoformat(timespec="seconds"), "ranges": ranges, "cancelled": cancelled}
+        if cancelled:
+            logger.info("Cancelled %d stale pending appointments in %d ranges", cancelled, ranges)
+        return cancelled
+
+    def lag(self, engine):
+        """Seconds since the oldest expired appointment still pending expired (0 if none)"""
+        appointment = self.appointment
+        now = datetime.now()
+        with engine.connect() as connection:
+            oldest = connection.execute(
+                select(appointment.c.appointment_date, appointment.c.end_time)
+                .where(appointment.c.id_appointment >= self.watermark, self._expired(now - self.expiry))
+                .order_by(appointment.c.appointment_date, appointment.c.end_time)
+                .limit(1)
+            ).first()
+        if oldest is None:
+            return 0.0
+        expired_at = datetime.combine(oldest.appointment_date, oldest.end_time) + self.expiry
+        return round((now - expired_at).total_seconds(), 3)
+
+    async def run(self, engine):
+        while True:
+            try:
+                await self.sweep(engine)
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                logger.exception("Sweep failed")
+            await asyncio.sleep(self.interval)
+
+    def status(self, engine):
+        finished = self.last_pass["finished_ms"] if self.last_pass else None
+        return {
+            "leader": self.leader,
+            "owner": self.owner,
+            "expiry_hours": self.expiry.total_seconds() / 3600,
+            "interval_seconds": self.interval,
+            "chunk": self.chunk,
+            "passes": self.passes,
+            "cancelled_total": self.cancelled_total,
+            "last_pass": self.last_pass,
+            "seconds_since_pass": round((now_ms() - finished) / 1000, 3) if finished else None,
+            "watermark": self.watermark,
+            # Measured by the lease holder once its first pass set the watermark,
+            # so the query reads only the part of the table the sweep still covers
+            "lag_seconds": self.lag(engine) if self.leader and self.passes else None,
+            "last_error": self.last_error,
+        }
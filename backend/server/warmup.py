@@ -0,0 +1,118 @@
+"""
+Startup warmup, started by the app's lifespan; GET /ready fails until it is done.
+
+A fresh worker pays three one-off costs on its first requests: configuring
+the mappers, opening pooled connections and compiling every ORM statement
+(SQLAlchemy caches compiled SQL per engine, keyed by statement shape, so only
+the first execution of each shape compiles). Warmup pays them before traffic
+arrives: configure_mappers(), check out and return a full pool of
+connections, then replay the hot GET routes in-process so their statements
+land in the compiled cache and their response serializers are built. Replayed
+requests carry WARMUP_SCOPE_KEY in their ASGI scope, which keeps them out of
+/metrics.
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger("barberian.warmup")
+
+WARMUP_SCOPE_KEY = "barberian.warmup"
+RETRY_SECONDS = 5
+
+
+def pool_capacity(engine):
+    """Connections the pool keeps open (1 for SQLite's single-connection pools)"""
+    pool = engine.pool
+    return pool.size() if isinstance(pool, QueuePool) else 1
+
+
+def prefill(engine):
+    """Open a full pool of connections, then return them all to the pool idle"""
+    connections = []
+    try:
+        for _ in range(pool_capacity(engine)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def prefill_async(engine):
+    connections = []
+    try:
+        for _ in range(pool_capacity(engine.sync_engine)):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+async def replay(app, paths):
+    """GET each path through the full ASGI app, one at a time; returns {path: status}"""
+
+    async def flagged(scope, receive, send):
+        scope[WARMUP_SCOPE_KEY] = True
+        await app(scope, receive, send)
+
+    statuses = {}
+    transport = httpx.ASGITransport(app=flagged, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+        for path in paths:
+            statuses[path] = (await client.get(path)).status_code
+    return statuses
+
+
+def compiled_statements(engine):
+    cache = getattr(engine, "_compiled_cache", None)
+    return len(cache) if cache is not None else None
+
+
+class Warmup:
+    def __init__(self):
+        self.ready = False
+        self.report = {}
+        self.error = None
+
+    async def run(self, app, engine, async_engine, paths):
+        started = time.perf_counter()
+        configure_mappers()
+        report = {"connections": await asyncio.to_thread(prefill, engine)}
+        if async_engine is not None:
+            report["async_connections"] = await prefill_async(async_engine)
+        report["routes"] = await replay(app, paths)
+        report["compiled_statements"] = compiled_statements(engine)
+        if async_engine is not None:
+            report["async_compiled_statements"] = compiled_statements(async_engine.sync_engine)
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        self.report = report
+        self.error = None
+        self.ready = True
+        logger.info("Warmup done in %.2fs: %s", report["seconds"], report)
+
+    async def run_until_ready(self, app, engine, async_engine, paths):
+        # The database may still be starting during a rollout: keep retrying
+        # rather than report ready with a cold pool
+        while not self.ready:
+            try:
+                await self.run(app, engine, async_engine, paths)
+            except Exception as exc:
+                self.error = f"{type(exc).__name__}: {exc}"
+                logger.exception("Warmup failed, retrying in %ss", RETRY_SECONDS)
+                await asyncio.sleep(RETRY_SECONDS)
+
+    def skip(self):
+        """Mark ready without warming (WARMUP=0)"""
+        configure_mappers()
+        self.report = {"skipped": True}
+        self.ready = True
+
+    def status(self):
+        return {"ready": self.ready, "warmup": self.report, "error": self.error}
@@ -55,6 +55,7 @@ CREATE TABLE citys (
     id_city INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
     id_department INT NOT NULL,
+    INDEX idx_city_department (id_department),
     FOREIGN KEY (id_department) REFERENCES departments(id_department)
 );
 
@@ -104,6 +105,11 @@ CREATE TABLE barbers (
     phone VARCHAR(255) NULL,
     direction VARCHAR(255) NULL,
     points INT NOT NULL DEFAULT 0,
+    INDEX idx_barber_city_rank (id_city, points, id_barber),
+    INDEX idx_barber_department_rank (id_department, points, id_barber),
+    INDEX idx_barber_specialty_rank (id_specialty, points, id_barber),
+    INDEX idx_barber_barbershop_rank (id_barbershop, points, id_barber),
+    INDEX idx_barber_rank (points, id_barber),
     FOREIGN KEY (id_user) REFERENCES users(id_user),
     FOREIGN KEY (id_genre) REFERENCES genres(id_genre),
     FOREIGN KEY (id_barbershop) REFERENCES barbershops(id_barbershop),
@@ -117,6 +123,7 @@ CREATE TABLE staff (
     id_staff INT AUTO_INCREMENT PRIMARY KEY,
     id_barber INT NOT NULL,
     id_barbershop INT NOT NULL,
+    INDEX idx_staff_barber (id_barber),
     FOREIGN KEY (id_barber) REFERENCES barbers(id_barber),
     FOREIGN KEY (id_barbershop) REFERENCES barbershops(id_barbershop)
 );
@@ -149,10 +156,73 @@ CREATE TABLE appointment (
     start_time TIME NOT NULL,
     end_time TIME NOT NULL,
     status ENUM('pending','confirmed','cancelled','done') DEFAULT 'pending',
+    INDEX idx_appointment_schedule (appointment_date, start_time, id_appointment),
+    INDEX idx_appointment_barber_day (id_barber, appointment_date, start_time),
+    INDEX idx_appointment_customer_day (id_customer, appointment_date, start_time),
     FOREIGN KEY (id_customer) REFERENCES customers(id_customer),
     FOREIGN KEY (id_barber) REFERENCES barbers(id_barber)
 );
 
+-- ==============================
+-- ROW COUNTERS (/stats)
+-- ==============================
+-- 16 shard rows per counted table, kept current by the API on insert/delete
+CREATE TABLE table_counters (
+    name VARCHAR(50) NOT NULL,
+    shard INT NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+-- ==============================
+-- DASHBOARD ROLLUPS (/dashboard)
+-- ==============================
+-- Appointments per barber, day and status, kept current by the API on every write
+CREATE TABLE appointment_rollups (
+    id_barber INT NOT NULL,
+    appointment_date DATE NOT NULL,
+    pending INT NOT NULL DEFAULT 0,
+    confirmed INT NOT NULL DEFAULT 0,
+    cancelled INT NOT NULL DEFAULT 0,
+    done INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_barber, appointment_date)
+);
+
+-- ==============================
+-- BACKGROUND JOBS AND REPLICAS
+-- ==============================
+-- Which server process runs the pending-appointment sweeper
+CREATE TABLE job_leases (
+    name VARCHAR(50) PRIMARY KEY,
+    owner VARCHAR(100) NOT NULL,
+    expires_ms BIGINT NOT NULL
+);
+
+-- Written on the primary; its copy on a read replica shows the replica's lag
+CREATE TABLE replica_heartbeat (
+    id INT PRIMARY KEY,
+    beat_ms BIGINT NOT NULL
+);
+
+-- ==============================
+-- SCHEMA VERSION
+-- ==============================
+-- Managed by backend/server/migrations.py; this script already contains
+-- every migration listed below.
+CREATE TABLE schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL
+);
+
+INSERT INTO schema_migrations (version, description, applied_at) VALUES
+(1, 'Indexes for the hot API access paths', NOW()),
+(2, 'Row counters for /stats', NOW()),
+(3, 'Heartbeat table for replica lag', NOW()),
+(4, 'Ranked indexes for /barbers/search', NOW()),
+(5, 'Per-barber daily occupancy rollups', NOW()),
+(6, 'Leases for background jobs', NOW());
+
 -- ==============================
 -- INITIAL DATA
 -- ==============================
@@ -170,4 +240,21 @@ INSERT INTO genres (name) VALUES ('Other');
 INSERT INTO users (full_name, email, password_hash, id_role) VALUES 
 ('Administrator', 'admin@barberian.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/Ft1ZWH4EjCqIFO5I2', 1);
 -- The password hash corresponds to 'admin123' using bcrypt.
+
+-- Seed the /stats counters from the data above (shard 0 holds the count)
+INSERT INTO table_counters (name, shard, row_count)
+WITH RECURSIVE shards (n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM shards WHERE n < 15)
+SELECT counted.name, shards.n, IF(shards.n = 0, counted.row_count, 0)
+FROM (
+    SELECT 'users' AS name, COUNT(*) AS row_count FROM users
+    UNION ALL SELECT 'customers', COUNT(*) FROM customers
+    UNION ALL SELECT 'barbers', COUNT(*) FROM barbers
+    UNION ALL SELECT 'staff', COUNT(*) FROM staff
+    UNION ALL SELECT 'appointments', COUNT(*) FROM appointment
+    UNION ALL SELECT 'barbershops', COUNT(*) FROM barbershops
+    UNION ALL SELECT 'specialties', COUNT(*) FROM specialties
+    UNION ALL SELECT 'departments', COUNT(*) FROM departments
+    UNION ALL SELECT 'cities', COUNT(*) FROM citys
+) AS counted
+CROSS JOIN shards;
 SET FOREIGN_KEY_CHECKS = 1;
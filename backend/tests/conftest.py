@@ -0,0 +1,65 @@
+"""
+Fixtures for the API tests: the app is built on a throwaway SQLite database
+with a small dataset and driven in-process over ASGI.
+"""
+
+import dataclasses
+import os
+import sys
+from datetime import time
+
+import pytest
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server")
+sys.path.insert(0, SERVER_DIR)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def seed(main, engine, barbers=3, customers=5, without=()):
+    """The schema but the `without` models' tables, reference rows, `barbers`
+    barbers and `customers` customers (ids from 1)"""
+    skipped = {model.__table__ for model in without}
+    main.Base.metadata.create_all(engine, tables=[table for table in main.Base.metadata.tables.values()
+                                                  if table not in skipped])
+    with main.SessionLocal(bind=engine) as db:
+        db.add_all([main.Role(name="customer"), main.Genre(name="Male"), main.Department(name="Antioquia"),
+                    main.Specialty(name="Classic cut", years_experience=3),
+                    main.BarberSchedule(day_of_week=main.DayOfWeekEnum.monday, start_time=time(9), end_time=time(18))])
+        db.flush()
+        db.add(main.City(name="Medellin", id_department=1))
+        db.flush()
+        for i in range(barbers + customers):
+            db.add(main.User(full_name=f"User {i}", email=f"user{i}@example.com", id_role=1))
+        db.flush()
+        for i in range(barbers):
+            db.add(main.Barber(id_user=i + 1, id_genre=1, id_department=1, id_city=1, id_specialty=1,
+                               id_barber_schedule=1))
+        for i in range(customers):
+            db.add(main.Customer(id_user=barbers + i + 1, id_genre=1, id_department=1, id_city=1))
+        db.commit()
+
+
+def app_settings(main, database_url, **overrides):
+    """The environment's settings on `database_url`, without warmup, the sweeper or replicas"""
+    defaults = {"warmup": False, "sweeper": False, "async_database_url": None, "replica_urls": ()}
+    return dataclasses.replace(main.Settings.from_env(), database_url=database_url, **{**defaults, **overrides})
+
+
+@pytest.fixture
+def build_app(tmp_path):
+    """build_app(without=(), **settings) -> (main, app) on a fresh seeded database
+    lacking the `without` models' tables. Settings default to the environment's,
+    without warmup or the sweeper."""
+    import main
+
+    def build(without=(), **overrides):
+        app = main.create_app(app_settings(main, f"sqlite:///{tmp_path / 'primary.db'}", **overrides))
+        seed(main, main.engine, without=without)
+        return main, app
+
+    yield build
+    main.engine.dispose()
@@ -0,0 +1,73 @@
+from datetime import date, time
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+import main
+from conftest import seed, app_settings
+
+pytestmark = pytest.mark.anyio
+
+URLS = [
+    "/users/?limit=3",
+    "/users/2",
+    "/customers/?limit=2",
+    "/customers/1",
+    "/barbers/?limit=2",
+    "/barbers/1",
+    "/barbers/by-city/1",
+    "/appointments/?limit=2",
+    "/appointments/2",
+    "/appointments/by-customer/1",
+    "/appointments/by-barber/2",
+    "/appointments/?fields=id_appointment,start_time&include=barber",
+]
+
+
+def add_appointments(count=4):
+    with main.SessionLocal() as db:
+        for i in range(count):
+            db.add(main.Appointment(id_customer=i % 2 + 1, id_barber=i % 3 + 1, appointment_date=date(2031, 3, 3),
+                                    start_time=time(9 + i), end_time=time(10 + i)))
+        db.commit()
+
+
+async def read_all(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = [await client.get(url) for url in URLS]
+        # Follow the keyset cursor of the first appointment page
+        cursor = responses[7].headers["X-Next-Cursor"]
+        responses.append(await client.get("/appointments/", params={"limit": 2, "cursor": cursor}))
+    return responses
+
+
+@pytest.fixture
+async def sync_responses(tmp_path_factory):
+    # The same data served by the sync handlers, as the expected answers
+    database_url = f"sqlite:///{tmp_path_factory.mktemp('sync') / 'primary.db'}"
+    app = main.create_app(app_settings(main, database_url, async_mode=False))
+    seed(main, main.engine)
+    add_appointments()
+    responses = await read_all(app)
+    main.engine.dispose()
+    return responses
+
+
+async def test_async_handlers_answer_like_the_sync_ones(sync_responses, build_app):
+    _, app = build_app(async_mode=True)
+    add_appointments()
+    statements = []
+    event.listen(main.async_engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    responses = await read_all(app)
+    await main.async_engine.dispose()
+
+    for url, response, expected in zip(URLS + ["/appointments/?cursor"], responses, sync_responses):
+        assert response.status_code == 200, url
+        assert response.json() == expected.json(), url
+    assert responses[-1].json(), "the second page is not empty"
+    # Every one of those reads went through the aiosqlite engine
+    assert len(statements) >= len(responses)
+    paths = {route.path: route.endpoint for route in app.routes if "GET" in getattr(route, "methods", ())}
+    assert paths["/appointments/{appointment_id}"] is main.read_appointment_async
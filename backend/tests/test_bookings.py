@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def booking(start_hour, customer=1):
+    return {"id_customer": customer, "id_barber": 1, "appointment_date": "2031-03-03",
+            "start_time": f"{start_hour:02d}:00", "end_time": f"{start_hour + 1:02d}:00"}
+
+
+async def test_single_and_bulk_booking_of_one_slot_store_one(build_app):
+    main, app = build_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for hour in range(9, 17):
+            single, bulk = await asyncio.gather(
+                client.post("/appointments/", json=booking(hour)),
+                client.post("/appointments/bulk", params={"atomic": "true"}, json=[booking(hour, customer=2)]),
+            )
+            # Whichever request commits second sees the other's booking
+            assert sorted([single.status_code, bulk.status_code]) in ([200, 422], [200, 409])
+            if single.status_code == 200:
+                assert bulk.status_code == 422
+            else:
+                assert single.status_code == 409 and bulk.status_code == 200
+
+    with main.SessionLocal() as db:
+        stored = db.query(main.Appointment.start_time).filter(main.Appointment.id_barber == 1).all()
+    assert len(stored) == len(range(9, 17))
+
+
+async def test_bulk_booking_reports_overlap_with_stored_booking(build_app):
+    main, app = build_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.post("/appointments/", json=booking(10))).status_code == 200
+        response = await client.post("/appointments/bulk", json=[booking(10, customer=2), booking(11, customer=2)])
+        assert response.status_code == 200
+        body = response.json()
+        assert body["created"] == 1
+        assert [error["index"] for error in body["errors"]] == [0]
+        assert (await client.post("/appointments/", json=booking(11))).status_code == 409
+
+
+async def test_batch_status_reports_a_repeated_id_once(build_app):
+    main, app = build_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = (await client.post("/appointments/", json=booking(9))).json()["id_appointment"]
+        second = (await client.post("/appointments/", json=booking(10))).json()["id_appointment"]
+        response = await client.patch("/appointments/status", json={"status": "confirmed", "ids": [second, first, second, 999]})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["updated"] == 2
+        assert [(result["id_appointment"], result["outcome"]) for result in body["results"]] == [
+            (second, "updated"), (first, "updated"), (999, "not_found")]
+        dashboard = await client.get("/dashboard/barbers/1", params={"date_from": "2031-03-03", "date_to": "2031-03-03"})
+        assert dashboard.json()["totals"]["confirmed"] == 2
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import date, time
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.anyio
+
+
+def add_appointments(count):
+    with main.SessionLocal() as db:
+        db.add_all(main.Appointment(id_customer=1, id_barber=1, appointment_date=date(2031, 3, 3),
+                                    start_time=time(9), end_time=time(10)) for _ in range(count))
+        db.commit()
+
+
+async def never_disconnect():
+    await asyncio.Event().wait()
+
+
+async def export(app, send, path="/appointments/export", receive=never_disconnect):
+    # Straight over ASGI: an HTTP client transport would buffer the body
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "path": path,
+             "raw_path": path.encode(), "root_path": "", "query_string": b"format=csv", "headers": [],
+             "server": ("test", 80), "client": ("client", 1)}
+    await app(scope, receive, send)
+
+
+async def test_export_holds_its_admission_slot_until_the_body_ends(build_app):
+    _, app = build_app(admission=True)
+    add_appointments(2500)
+    chunks = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append((main.admission_controller.active, main.engine.pool.checkedout(), message.get("more_body", False)))
+
+    await export(app, send)
+
+    # Header row, three partitions of rows, then the closing empty chunk
+    assert [active for active, _, more in chunks if more] == [1, 1, 1, 1]
+    assert all(checked_out == 1 for _, checked_out, more in chunks if more)
+    assert main.admission_controller.active == 0
+
+
+async def test_export_releases_its_slot_and_connection_when_the_send_fails(build_app):
+    _, app = build_app(admission=True)
+    add_appointments(2500)
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        await export(app, send, "/customers/export")
+    assert main.admission_controller.active == 0
+    assert main.engine.pool.checkedout() == 0
+
+
+async def test_export_releases_its_slot_and_connection_on_disconnect(build_app):
+    _, app = build_app(admission=True)
+    add_appointments(2500)
+    first_chunk = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            first_chunk.set()
+            await asyncio.sleep(3600)
+
+    async def receive():
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    await export(app, send, receive=receive)
+    assert main.admission_controller.active == 0
+    assert main.engine.pool.checkedout() == 0
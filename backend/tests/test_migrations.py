@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+import main
+
+BOOKING = {"id_customer": 1, "id_barber": 1, "appointment_date": "2031-03-03", "start_time": "09:00", "end_time": "10:00"}
+
+
+def test_writes_and_reads_without_counter_and_rollup_tables(build_app):
+    _, app = build_app(without=(main.TableCounter, main.AppointmentRollup))
+    client = TestClient(app)
+
+    created = client.post("/appointments/", json=BOOKING)
+    assert created.status_code == 200
+    bulk = client.post("/appointments/bulk", json=[{**BOOKING, "start_time": "10:00", "end_time": "11:00"}])
+    assert bulk.status_code == 200 and bulk.json()["created"] == 1
+    status = client.patch(f"/appointments/{created.json()['id_appointment']}/status", params={"status": "confirmed"})
+    assert status.status_code == 200
+
+    # /stats counts exactly, the dashboards sum the appointment table
+    assert client.get("/stats").json()["appointments"] == 2
+    dashboard = client.get("/dashboard/barbers/1", params={"date_from": "2031-03-01", "date_to": "2031-03-31"}).json()
+    assert dashboard["totals"] == {"pending": 1, "confirmed": 1, "cancelled": 0, "done": 0, "total": 2}
+
+
+def test_counters_and_rollup_follow_writes(build_app):
+    _, app = build_app()
+    with main.engine.begin() as connection:
+        main.row_counters.rebuild(connection)
+    client = TestClient(app)
+
+    assert client.post("/appointments/", json=BOOKING).status_code == 200
+    assert client.get("/stats").json() == client.get("/stats", params={"exact": "true"}).json()
+    dashboard = client.get("/dashboard/barbers/1", params={"date_from": "2031-03-03", "date_to": "2031-03-03"}).json()
+    assert dashboard["totals"]["pending"] == 1
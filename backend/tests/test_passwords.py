@@ -0,0 +1,104 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import passwords
+
+# The lowest costs keep the pool's hashes fast
+COST = 4
+LOGIN = {"email": "user1@example.com", "password": "correct horse"}
+
+
+@pytest.fixture
+def login_app(build_app):
+    _, app = build_app(password_cost=COST)
+    yield app
+    main.password_hasher.shutdown()
+
+
+def set_password_hash(stored):
+    with main.SessionLocal() as db:
+        db.query(main.User).filter(main.User.email == LOGIN["email"]).update({"password_hash": stored})
+        db.commit()
+
+
+def password_hash():
+    with main.SessionLocal() as db:
+        return db.query(main.User.password_hash).filter(main.User.email == LOGIN["email"]).scalar()
+
+
+@pytest.mark.parametrize("scheme", ["scrypt", "bcrypt"])
+def test_hash_verify_round_trip(scheme):
+    stored = passwords.hash_password("correct horse", scheme, COST)
+
+    assert passwords.scheme_of(stored) == scheme
+    assert passwords.verify_password("correct horse", stored)
+    assert not passwords.verify_password("wrong horse", stored)
+    assert not passwords.needs_rehash(stored, scheme, COST)
+    assert stored != passwords.hash_password("correct horse", scheme, COST), "each hash has its own salt"
+
+
+def test_rehash_when_cost_or_scheme_changes():
+    stored = passwords.hash_password("correct horse", "scrypt", COST)
+
+    assert passwords.check_password("correct horse", stored, "scrypt", COST) == (True, None)
+    assert passwords.check_password("wrong horse", stored, "scrypt", COST + 1) == (False, None)
+
+    matches, replacement = passwords.check_password("correct horse", stored, "scrypt", COST + 1)
+    assert matches and passwords.cost_of(replacement) == (COST + 1, passwords.SCRYPT_R, passwords.SCRYPT_P)
+    matches, replacement = passwords.check_password("correct horse", stored, "bcrypt", COST)
+    assert matches and passwords.scheme_of(replacement) == "bcrypt"
+    assert passwords.verify_password("correct horse", replacement)
+
+
+def test_login_upgrades_a_plaintext_password(login_app):
+    set_password_hash(LOGIN["password"])
+    client = TestClient(login_app)
+
+    response = client.post("/auth/login", json=LOGIN)
+    assert response.status_code == 200
+    assert response.json()["email"] == LOGIN["email"]
+    stored = password_hash()
+    assert passwords.scheme_of(stored) == "scrypt" and passwords.verify_password(LOGIN["password"], stored)
+
+    # The upgraded hash is current, so the next login keeps it
+    assert client.post("/auth/login", json=LOGIN).status_code == 200
+    assert password_hash() == stored
+
+
+def test_login_upgrades_a_bcrypt_hash(login_app):
+    # Like the seeded admin of barbarian-db.sql
+    set_password_hash(passwords.hash_password(LOGIN["password"], "bcrypt", COST))
+
+    assert TestClient(login_app).post("/auth/login", json=LOGIN).status_code == 200
+    assert passwords.scheme_of(password_hash()) == "scrypt"
+
+
+def test_login_rejects_an_unknown_email(login_app):
+    response = TestClient(login_app).post("/auth/login", json={**LOGIN, "email": "nobody@example.com"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid email or password"
+
+
+def test_login_rejects_a_wrong_password(login_app):
+    set_password_hash(passwords.hash_password(LOGIN["password"], "scrypt", COST))
+    stored = password_hash()
+
+    response = TestClient(login_app).post("/auth/login", json={**LOGIN, "password": "wrong horse"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid email or password"
+    assert password_hash() == stored
+
+
+def test_full_password_queue_answers_503(login_app):
+    set_password_hash(LOGIN["password"])
+    main.password_hasher.limit = 0
+    client = TestClient(login_app)
+
+    response = client.post("/auth/login", json=LOGIN)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main.settings.admission_retry_after)
+    user = {"full_name": "New User", "email": "new@example.com", "password": "secret", "id_role": 1}
+    assert client.post("/users/", json=user).status_code == 503
+    assert main.password_hasher.stats()["rejected"] == 2
+    assert password_hash() == LOGIN["password"]
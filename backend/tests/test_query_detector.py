@@ -0,0 +1,51 @@
+from datetime import date, time
+
+import pytest
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import main
+from query_detector import QueryPatternError, normalize
+
+
+def add_appointments(count):
+    with main.SessionLocal() as db:
+        for i in range(count):
+            db.add(main.Appointment(id_customer=i % 5 + 1, id_barber=1, appointment_date=date(2031, 3, 3),
+                                    start_time=time(8), end_time=time(9)))
+        db.commit()
+
+
+def lazy_customers(db=Depends(main.get_db)):
+    # One lazy load per appointment's customer: the N+1 the detector is for
+    return [appointment.customer.id_user for appointment in db.query(main.Appointment).all()]
+
+
+def test_normalize_ignores_values_and_in_list_length():
+    assert normalize("SELECT * FROM users WHERE id = 7 AND name = 'x'") == normalize("SELECT * FROM users WHERE id = 8 AND name = 'y'")
+    assert normalize("SELECT * FROM users WHERE id IN (?, ?, ?)") == "SELECT * FROM users WHERE id IN (?)"
+
+
+def test_raise_mode_fails_a_request_with_repeated_selects(build_app):
+    _, app = build_app(query_detector="raise", query_repeat_threshold=3)
+    app.add_api_route("/lazy-customers", lazy_customers)
+    add_appointments(5)
+    client = TestClient(app)
+
+    with pytest.raises(QueryPatternError, match=r"Possible N\+1 in GET /lazy-customers: 5 x SELECT"):
+        client.get("/lazy-customers")
+    # The API's own routes load their relationships up front
+    assert client.get("/appointments/").status_code == 200
+    assert client.get("/appointments/by-barber/1").status_code == 200
+
+
+def test_failed_statement_leaves_no_start_time(build_app):
+    build_app(query_detector="raise")
+    with main.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM no_such_table"))
+        assert connection.info["query_detector_started"] == []
+        connection.execute(text("SELECT 1"))
+        assert connection.info["query_detector_started"] == []
@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from replicas import PRIMARY_COOKIE
+
+BOOKING = {"id_customer": 1, "id_barber": 1, "appointment_date": "2031-03-03", "start_time": "09:00", "end_time": "10:00"}
+
+
+def replicate(primary, replica):
+    with sqlite3.connect(primary) as source, sqlite3.connect(replica) as target:
+        source.backup(target)
+
+
+def test_reads_go_to_replica_except_after_a_write(build_app, tmp_path):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    _, app = build_app(replica_urls=(f"sqlite:///{replica}",), replica_max_lag=60)
+    # The monitor's first check writes a heartbeat, the second finds it on the replica
+    main.replica_set.check(main.engine)
+    replicate(primary, replica)
+    main.replica_set.check(main.engine)
+    assert main.replica_set.available == main.replica_set.replicas
+
+    writer, reader = TestClient(app), TestClient(app)
+    created = writer.post("/appointments/", json=BOOKING)
+    assert created.status_code == 200
+    assert PRIMARY_COOKIE in created.cookies
+    url = f"/appointments/{created.json()['id_appointment']}"
+
+    # The writer reads its own write from the primary; another client reads
+    # the replica, which has not seen it yet
+    assert writer.get(url).status_code == 200
+    assert reader.get(url).status_code == 404
+    replicate(primary, replica)
+    assert reader.get(url).status_code == 200
+
+
+def test_lagging_replica_gets_no_reads(build_app, tmp_path):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    _, app = build_app(replica_urls=(f"sqlite:///{replica}",), replica_max_lag=0.2)
+    main.replica_set.check(main.engine)
+    replicate(primary, replica)
+    main.replica_set.check(main.engine)
+    assert main.replica_set.available
+
+    created = TestClient(app).post("/appointments/", json=BOOKING)
+    time.sleep(0.3)
+    main.replica_set.check(main.engine)
+    assert main.replica_set.available == []
+    # With no replica left, a client without the cookie reads the primary
+    assert TestClient(app).get(f"/appointments/{created.json()['id_appointment']}").status_code == 200
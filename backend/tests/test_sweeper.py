@@ -0,0 +1,89 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import main
+from sweeper import PendingSweeper
+
+pytestmark = pytest.mark.anyio
+
+PENDING, CONFIRMED, CANCELLED = (main.AppointmentStatusEnum.pending, main.AppointmentStatusEnum.confirmed,
+                                 main.AppointmentStatusEnum.cancelled)
+
+
+def add_appointment(day, status, end=time(10)):
+    with main.SessionLocal() as db:
+        appointment = main.Appointment(id_customer=1, id_barber=1, appointment_date=day,
+                                       start_time=time(9), end_time=end, status=status)
+        db.add(appointment)
+        db.commit()
+        return appointment.id_appointment
+
+
+def statuses():
+    with main.SessionLocal() as db:
+        return dict(db.query(main.Appointment.id_appointment, main.Appointment.status))
+
+
+def sweeper(**kwargs):
+    return PendingSweeper(main.Appointment, main.JobLease, main.occupancy_rollup, PENDING, CANCELLED, **kwargs)
+
+
+def test_sweep_range_cancels_and_publishes_stale_pending(build_app):
+    build_app()
+    stale = add_appointment(date(2020, 1, 6), PENDING)
+    confirmed = add_appointment(date(2020, 1, 6), CONFIRMED)
+    upcoming = add_appointment(date(2099, 1, 5), PENDING)
+    published = []
+
+    cancelled, left = sweeper(publish=published.extend).sweep_range(main.engine, 1, upcoming + 1, datetime(2021, 1, 1))
+
+    assert (cancelled, left) == (1, upcoming)
+    assert [(row["id_appointment"], row["status"]) for row in published] == [(stale, CANCELLED)]
+    assert statuses() == {stale: CANCELLED, confirmed: CONFIRMED, upcoming: PENDING}
+
+
+async def test_sweep_resumes_from_the_first_id_left_pending(build_app):
+    build_app()
+    old = [add_appointment(date(2020, 1, 6), PENDING) for _ in range(3)]
+    upcoming = add_appointment(date(2099, 1, 5), PENDING)
+    later = add_appointment(date(2020, 1, 7), CONFIRMED)
+    job = sweeper(chunk=2, pause=0)
+
+    assert await job.sweep(main.engine) == 3
+    assert job.watermark == upcoming
+    assert job.lag(main.engine) == 0
+
+    # A late insert with an old slot is above the watermark and still found
+    late = add_appointment(date(2020, 1, 8), PENDING)
+    assert await job.sweep(main.engine) == 1
+    assert job.last_pass["ranges"] == 2
+    assert job.watermark == upcoming
+    assert statuses() == {**{id_: CANCELLED for id_ in old}, upcoming: PENDING, later: CONFIRMED, late: CANCELLED}
+
+
+def test_lag_is_the_age_of_the_oldest_stale_pending_appointment(build_app):
+    build_app()
+    expired_at = datetime.now() - timedelta(hours=2)
+    # Expires 24 hours after it ends; this one expired two hours ago
+    add_appointment(expired_at.date() - timedelta(days=1), PENDING, end=expired_at.time().replace(microsecond=0))
+    add_appointment(date(2099, 1, 5), PENDING)
+    job = sweeper()
+
+    assert job.lag(main.engine) == pytest.approx(2 * 3600, abs=5)
+
+
+async def test_watermark_stops_one_past_the_highest_id(build_app):
+    build_app()
+    done = add_appointment(date(2020, 1, 6), CONFIRMED)
+    job = sweeper(pause=0)
+
+    assert await job.sweep(main.engine) == 0
+    assert job.watermark == done + 1
+
+    # A stale pending row inserted after the pass is the next id, not past the chunk
+    stale = add_appointment(date(2020, 1, 6), PENDING)
+    assert job.lag(main.engine) > 0
+    assert await job.sweep(main.engine) == 1
+    assert statuses()[stale] == CANCELLED
+    assert job.lag(main.engine) == 0